@@ -12,6 +12,10 @@ Input: A weighted bipartite graph.
 
    Where rho_0, rho_1 are parameters of the model, ones_vector is a vector of ones, shaped as p,
    I is the identity matrix (of same dimensions as W) and ^ -1 means taking the inverse of the matrix.
+   Rather than inverting the dense matrix (O(N^3) time and O(N^2) memory), by default W is kept sparse (CSR) and p
+   is found by solving the transposed sparse system ((1-rho_0) I - rho_1 W)^T p^T = (1 - rho_0 - rho_1) ones_vector^T,
+   iteratively or directly (see the 'solver' parameter). Since rho_1 < 1 - rho_0 the system is diagonally dominant,
+   so the iterative solvers converge in few steps.
 3. Using p and W, we create a matrix of contributions, where the (i, j)-th element represents the amount of fluid that
    j receives from i per time unit, in the steady state.
 4. The contributions matrix is normalized like in part 1, resulting the probabilities matrix.
@@ -26,37 +30,61 @@ of the following parameters (e.g. {'rho_0': 0.1, ...}):
             unit.
     rho_1 - Controls the amount of fluid we choose to pass on the edges. (1 - rho_0 - rho_1) represents the amount of
             fluid per time unit added to each vertex.
+    solver - (optional) How to find p: "gmres" (default) or "bicgstab" (sparse iterative solvers, starting from
+             p = ones), "spsolve" (a sparse direct solver, exact but slow when the factors fill in, as in large random
+             graphs), or "inverse" (the dense inverse of the matrix, for small graphs only).
+    tol - (optional) The relative tolerance of the iterative solvers (default 1e-10).
 """
+import warnings
 
-import networkx as nx
 import numpy as np
-from matching_solutions import MatchingProblem
+from scipy import sparse
+from scipy.sparse import linalg
 
+from BipartiteProbabilisticMatching.matching_solutions import MatchingProblem
 
-def algorithm(mp: MatchingProblem, params):
+SOLVERS = ("gmres", "bicgstab", "spsolve", "inverse")
+
+
+def algorithm(mp: MatchingProblem, params, is_normalized=True, both_directions=False):
     """
     The main function of the algorithm.
 
     :param mp: The main class containing the graph on which we want to apply the algorithm.
     :param params: The dictionary of the parameters of this algorithm.
-    :return: The final probability matrix.
+    :param is_normalized: Whether to normalize the contribution matrix by rows.
+    :param both_directions: Whether to return also the probability matrix of the reversed problem, from the same p.
+    :return: The final probability matrix (and the reversed one, if both_directions).
     """
-    w = create_full_normalize_adj(mp.graph)
-    p = calculate_p(w, params['rho_0'], params['rho_1'])
-    contribution_matrix = calculate_contribution_matrix(p, w)
-    c = normalization(contribution_matrix[:mp.shape[0], mp.shape[1]:])
-    return c
-
-
-def create_full_normalize_adj(graph):
+    solver = params.get('solver', 'gmres')
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
+    if solver == "inverse":
+        w = create_full_normalize_adj(mp.full_adjacency())
+        p = calculate_p(w, params['rho_0'], params['rho_1'])
+    else:
+        w = create_full_normalize_adj(mp.full_adjacency(), is_sparse=True)
+        p = calculate_p_sparse(w, params['rho_0'], params['rho_1'], solver, params.get('tol', 1e-10))
+    directions = (False, True) if both_directions else (False,)
+    c = [calculate_contribution_matrix(p, w, mp.shape, reverse) for reverse in directions]
+    if is_normalized:
+        c = [normalization(m) for m in c]
+    return tuple(c) if both_directions else c[0]
+
+
+def create_full_normalize_adj(adjacency, is_sparse=False):
     """
-    From the given networkx bipartite graph,
+    From the given full adjacency matrix of the bipartite graph (see MatchingProblem.full_adjacency),
     create the full adjacency matrix and normalize it by rows.
 
-    :param graph: Our bipartite graph.
+    :param adjacency: The full adjacency matrix of our bipartite graph, as a sparse matrix.
+    :param is_sparse: Whether to create the matrix as a sparse CSR matrix (rather than a dense numpy array).
     :return: The normalized full adjacency matrix of the graph.
     """
-    m = np.array(nx.to_numpy_matrix(graph))
+    if is_sparse:
+        m = sparse.csr_matrix(adjacency, dtype=float)
+    else:
+        m = sparse.csr_matrix(adjacency, dtype=float).toarray()
     w = normalization(m)
     return w
 
@@ -66,9 +94,13 @@ def normalization(m):
     Normalize the matrix by rows. The normalization is set such that for all vertices with positive degree (meaning the
     sum of the row is not zero), the sum of m over the corresponding row will become 1.
 
-    :param m: The adjacency matrix.
+    :param m: The adjacency matrix (dense, or sparse).
     :return: The normalized adjacency matrix by rows.
     """
+    if sparse.issparse(m):
+        sums = np.asarray(m.sum(axis=1)).ravel()
+        sums[sums == 0] = 1.
+        return sparse.diags(1. / sums) @ sparse.csr_matrix(m)
     sums = np.array([np.sum(m[v, :]) if np.sum(m[v, :]) else 1. for v in range(m.shape[0])])
     m = np.divide(m.T, sums).T
     return m
@@ -90,16 +122,54 @@ def calculate_p(w, r0, r1):
     return p
 
 
-def calculate_contribution_matrix(p, w):
+def calculate_p_sparse(w, r0, r1, solver="gmres", tol=1e-10):
+    """
+    Calculate the vector p as calculate_p does, by solving the transposed system
+    ((1-r0) I - r1 W)^T p^T = (1-r0-r1) ones_vector^T with W kept sparse.
+
+    :param w: The normalized full adjacency matrix, as a sparse matrix.
+    :param r0: The parameter rho_0.
+    :param r1: The parameter rho_1.
+    :param solver: "spsolve" for a sparse direct solver, or "gmres" / "bicgstab" for an iterative one.
+    :param tol: The relative tolerance of the iterative solvers.
+    :return: The vector p of amounts of fluid on each vertex in steady state, shaped (1, number of vertices).
+    """
+    a = ((1-r0) * sparse.identity(w.shape[0], format="csr") - r1 * w).T.tocsc()
+    b = np.full(w.shape[0], 1-r0-r1)
+    if solver == "spsolve":
+        p = linalg.spsolve(a, b)
+    else:
+        method = linalg.gmres if solver == "gmres" else linalg.bicgstab
+        try:
+            p, info = method(a, b, x0=np.ones(w.shape[0]), rtol=tol, atol=0.)
+        except TypeError:
+            # scipy < 1.12 calls the relative tolerance tol
+            p, info = method(a, b, x0=np.ones(w.shape[0]), tol=tol, atol=0.)
+        if info != 0:
+            warnings.warn(f"{solver} did not converge to tolerance {tol} (info={info})")
+    return np.asarray(p).reshape((1, w.shape[0]))
+
+
+def calculate_contribution_matrix(p, w, shape, reverse=False):
     """
     Using p vector and w, we calculate the contribution matrix: c_ij = p_i * w_ij / p_j
     where c_ij is the contribution of vertex i to the vertex j, as explained above.
+    Only the biadjacency (upper right) block is calculated, as diag(p_rows) W_block diag(1 / p_columns): the data of
+    a sparse W is scaled in place (no python loops), and a dense W is scaled by broadcasting.
 
     :param p: The vector p of amounts of fluids in steady state.
-    :param w: The normalized full adjacency matrix
-    :return: The contribution matrix
+    :param w: The normalized full adjacency matrix (dense, or sparse)
+    :param shape: The shape of the biadjacency matrix.
+    :param reverse: Whether to calculate the lower left block instead (the contributions of the second side to the
+                    first), which is the contribution matrix of the reversed problem.
+    :return: The contribution matrix of the block (sparse CSR if w is sparse).
     """
-    for i in range(w.shape[0]):
-        for j in range(w.shape[1]):
-            w[i, j] = p[0, i] * w[i, j] / p[0, j]
-    return w
+    p = np.asarray(p, dtype=float).ravel()
+    first, second = slice(0, shape[0]), slice(shape[0], shape[0] + shape[1])
+    rows, columns = (second, first) if reverse else (first, second)
+    p_rows, p_inv = p[rows], 1. / p[columns]
+    if sparse.issparse(w):
+        c = sparse.csr_matrix(w)[rows, columns]
+        c.data *= np.repeat(p_rows, np.diff(c.indptr)) * p_inv[c.indices]
+        return c
+    return np.asarray(w)[rows, columns] * p_rows[:, None] * p_inv[None, :]
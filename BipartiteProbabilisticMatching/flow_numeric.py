@@ -8,7 +8,8 @@ Input: A weighted bipartite graph.
 2. Let p be a vector of the amount of fluids held in each vertex. It is initialized as a vector of ones, of size equal
    to the number of vertices.
 3. The vector p is iteratively updated until convergence (i.e., the 1-norm of the step, p_new - p_old, is smaller than a
-   parameter epsilon). The step of updating is done by flowing on the edges according to the following formula:
+   parameter epsilon. p is a row vector, so this 1-norm is the largest change of an entry). The step of updating is
+   done by flowing on the edges according to the following formula:
                         p = rho_0 * p + rho_1 (p * w) + (1 - rho_0 - rho_1) ones_vector
    where rho_0, rho_1 are parameters of the model, ones_vector is a vector of ones with the same shape as p.
 4. Using p and W, we create a matrices of contributions, where the (i, j)-th element represents the amount of fluid that
@@ -26,32 +27,43 @@ of the following parameters (e.g. {'rho_0': 0.6, ...}):
     rho_1 - Controls the amount of fluid we choose to pass on the edges. (1 - rho_0 - rho_1) represents the amount of
             fluid per time unit added to each vertex.
     epsilon - The tolerance constant. Controls how close we want to converge to the analytic solution.
+    acceleration - (optional) None (default) for the plain iterations of part 3, "anderson" for Anderson extrapolation
+                   over the last 'depth' (default 5) iterations, or "krylov" for solving the same steady state with
+                   BiCGSTAB (started from the ones vector, as in part 3). All stop as in part 3.
+    max_iter - (optional) The maximal number of iterations (default 10000).
+The number of iterations and the norm of the step in each of them are kept in mp.residuals.
 """
-import networkx as nx
+import warnings
+
 import numpy as np
 from BipartiteProbabilisticMatching.matching_solutions import MatchingProblem
 from sklearn.preprocessing import normalize
-from scipy.sparse import csr_matrix, linalg, lil_matrix
+from scipy.sparse import csr_matrix, identity, linalg
+
+ACCELERATIONS = (None, "anderson", "krylov")
+MAX_ITER = 10000
 
 
-def algorithm(mp: MatchingProblem, params, is_normalized=True):
+def algorithm(mp: MatchingProblem, params, is_normalized=True, both_directions=False):
     """
     The main function of the algorithm.
 
     :param mp: The main class containing the graph on which we want to apply the algorithm.
     :param params: The dictionary of the parameters of this algorithm.
     :param is_normalized: Whether to normalize the contribution matrix by rows.
-    :return: The final probability matrices.
+    :param both_directions: Whether to return also the probability matrices of the reversed problem, from the same p.
+    :return: The final probability matrices (and the reversed one, if both_directions).
     """
-    w = nx.to_scipy_sparse_matrix(mp.graph)
+    w = mp.full_adjacency()
     w = normalization(w)
-    p_node_balance = node_balance(w, params['rho_0'], params['rho_1'], params['epsilon'])
-    contribution_matrix = calculate_contribution_matrix(p_node_balance, w, mp.shape)
+    p_node_balance, mp.residuals = node_balance(w, params['rho_0'], params['rho_1'], params['epsilon'],
+                                                params.get('acceleration'), params.get('depth', 5),
+                                                params.get('max_iter', MAX_ITER))
+    directions = (False, True) if both_directions else (False,)
+    c = [calculate_contribution_matrix(p_node_balance, w, mp.shape, reverse) for reverse in directions]
     if is_normalized:
-        c = normalization(contribution_matrix)
-    else:
-        c = contribution_matrix
-    return c
+        c = [normalization(contribution_matrix) for contribution_matrix in c]
+    return tuple(c) if both_directions else c[0]
 
 
 def normalization(m):
@@ -66,47 +78,97 @@ def normalization(m):
     return w_normalized
 
 
-def node_balance(w, r0, r1, epsilon):
+def node_balance(w, r0, r1, epsilon, acceleration=None, depth=5, max_iter=MAX_ITER):
     """
     Create the vector p (initialized as a vector of ones) and run the flow until convergence.
+    p is kept as a dense vector, and the flow p * w is calculated as W^T p, with W^T transposed once into CSR.
 
     :param w: The normalized full adjacency matrices.
     :param r0: The parameter rho_0.
     :param r1: The parameter rho_1.
-    :param epsilon: The tolerance parameter. We will stop the iterations if ||p_new - p_old||_1 < epsilon.
-    :return: The final (steady state) vector p.
+    :param epsilon: The tolerance parameter. We will stop the iterations if ||p_new - p_old||_1 < epsilon (the 1-norm
+                    of the row vector, i.e. the largest change of an entry).
+    :param acceleration: None, "anderson" or "krylov", as explained above.
+    :param depth: The number of last iterations used by the Anderson extrapolation.
+    :param max_iter: The maximal number of iterations. A warning is raised if p did not converge by then.
+    :return: The final (steady state) vector p, shaped (1, number of vertices), and the list of ||p_new - p_old||_1
+             of every iteration (so its length is the number of iterations).
     """
-    p = csr_matrix(np.ones(w.shape[0]))
-    condition = epsilon + 1
-    ones = csr_matrix(np.ones(p.shape[1]))
-    while condition > epsilon:
-        p_new = r0 * p + r1 * p.dot(w) + (1 - r0 - r1) * ones
-        condition = linalg.norm(p_new-p, 1)
+    if acceleration not in ACCELERATIONS:
+        raise ValueError(f"Unknown acceleration '{acceleration}', expected one of {ACCELERATIONS}")
+    w_t = csr_matrix(w, dtype=float).T.tocsr()
+    p = np.ones(w.shape[0])
+    if acceleration == "krylov":
+        return krylov_balance(w_t, r0, r1, epsilon, max_iter)
+    residuals = []
+    g_history, f_history = [], []
+    while len(residuals) < max_iter:
+        p_new = r0 * p + r1 * (w_t @ p) + (1 - r0 - r1)
+        step = p_new - p
+        residuals.append(np.abs(step).max())
+        if residuals[-1] <= epsilon:
+            p = p_new
+            break
+        if acceleration == "anderson":
+            '''the combination of the last steps with the smallest step, applied to the last flows'''
+            g_history, f_history = g_history[-depth:] + [p_new], f_history[-depth:] + [step]
+            if len(f_history) > 1:
+                d_f, d_g = np.diff(f_history, axis=0).T, np.diff(g_history, axis=0).T
+                p_new = p_new - d_g @ np.linalg.lstsq(d_f, step, rcond=None)[0]
         p = p_new
-    return p
+    else:
+        warnings.warn(f"node_balance did not converge to {epsilon} in {max_iter} iterations")
+    return p.reshape((1, w.shape[0])), residuals
+
+
+def krylov_balance(w_t, r0, r1, epsilon, max_iter=MAX_ITER):
+    """
+    Find the steady state of node_balance by solving ((1 - r0) I - r1 W^T) p = (1 - r0 - r1) ones_vector with
+    BiCGSTAB. The step p_new - p_old of node_balance is exactly the residual of this system, so the same stopping rule
+    holds: ||residual||_2 < epsilon ensures that no entry of the residual reaches epsilon.
+
+    :param w_t: The transposed normalized full adjacency matrices, as a CSR matrix.
+    :param r0: The parameter rho_0.
+    :param r1: The parameter rho_1.
+    :param epsilon: The tolerance parameter.
+    :param max_iter: The maximal number of iterations.
+    :return: The vector p, shaped (1, number of vertices), and the list of the largest entry of the residual of every
+             iteration.
+    """
+    n = w_t.shape[0]
+    a = ((1 - r0) * identity(n, format="csr") - r1 * w_t).tocsr()
+    b = np.full(n, 1 - r0 - r1)
+    residuals = []
+    kwargs = {"x0": np.ones(n), "atol": epsilon, "maxiter": max_iter,
+              "callback": lambda x: residuals.append(np.abs(b - a @ x).max())}
+    try:
+        p, info = linalg.bicgstab(a, b, rtol=0., **kwargs)
+    except TypeError:
+        # scipy < 1.12 calls the relative tolerance tol
+        p, info = linalg.bicgstab(a, b, tol=0., **kwargs)
+    if info != 0:
+        warnings.warn(f"krylov node_balance did not converge to {epsilon} (info={info})")
+    return p.reshape((1, n)), residuals
 
 
-def calculate_contribution_matrix(p, w, shape):
+def calculate_contribution_matrix(p, w, shape, reverse=False):
     """
     Using p vector and w, we calculate the contribution matrices: c_ij = p_i * w_ij / p_j
     where c_ij is the contribution of vertex i to the vertex j, as explained above.
+    Only the biadjacency (upper right) block is calculated, as diag(p_rows) W_block diag(1 / p_columns), by scaling
+    the data of the CSR block in place.
 
     :param p: The vector p of amounts of fluids in steady state.
     :param w: The normalized full adjacency matrices.
     :param shape: The shape of the biadjacency matrix.
-    :return: The contribution matrices
+    :param reverse: Whether to calculate the lower left block instead (the contributions of the second side to the
+                    first), which is the contribution matrices of the reversed problem.
+    :return: The contribution matrices of the block, as a CSR matrix.
     """
-    p = lil_matrix(p)
-    w = lil_matrix(w)
-    m = lil_matrix((shape[0], shape[1]))
-    a = p.copy()
-    p_inv = lil_matrix((p.shape[0], shape[1]))
-    p = p[0, shape[1]:]
-    w = w[:shape[0], shape[0]:]
-    for j in range(shape[1]):
-        p_inv[0, j] = 1/a[0, shape[0] + j]
-    for i in range(shape[0]):
-        p_w = p[0, i] * w[i, :]
-        d = p_w.multiply(p_inv[0, :])
-        m[i, :] = d
+    p = np.asarray(p, dtype=float).ravel()
+    first, second = slice(0, shape[0]), slice(shape[0], shape[0] + shape[1])
+    rows, columns = (second, first) if reverse else (first, second)
+    p_rows, p_inv = p[rows], 1. / p[columns]
+    m = csr_matrix(w)[rows, columns]
+    m.data *= np.repeat(p_rows, np.diff(m.indptr)) * p_inv[m.indices]
     return m
@@ -1,5 +1,5 @@
 import numpy as np
-from scipy.sparse import csr_matrix
+from scipy.sparse import bmat, csr_matrix, issparse
 import pandas as pd
 import networkx as nx
 import matplotlib.pyplot as plt
@@ -19,7 +19,7 @@ class MatchingProblem:
         "null_model": "Null model"
     }
 
-    def __init__(self, graph_path, algorithm, params, path, row_ind=0, col_ind=1, matches_path=None):
+    def __init__(self, graph_path, algorithm, params, path, row_ind=0, col_ind=1, matches_path=None, reverse_path=None):
         """
         The main class. Receives a graph and the ground truth values and implements the requested algorithm.
         The results can later be measured using top-k accuracy and the sum of probabilities score, or can be visualized.
@@ -32,23 +32,33 @@ class MatchingProblem:
         :param row_ind: index of column of sources side in csv file.
         :param col_ind: index of column of targets side in csv file.
         :param matches_path: The path to a csv file of the ground truth matches.
+        :param reverse_path: If given, the probability matrix of the reversed problem (from the targets side to the
+               sources side, as with row_ind and col_ind swapped) is calculated too, from the same loaded graph and the
+               same steady state, kept in reverse_p_mat and saved in this path.
         """
         if matches_path is not None:
             self.true_matches = self._load_matches(matches_path)
         self.algorithm_name = self.algorithm_names[algorithm]
         self._char_to_num_row, self._num_to_char_row, self._char_to_num_col, self._num_to_char_col = {}, {}, {}, {}
         self.is_mapped = False
-        self.graph, self.shape = self.load_graph(graph_path, row_ind, col_ind)
-        self.p_mat = self.algorithm(algorithm, params, is_normalized=True)
+        self._graph = None
+        self.biadjacency, self.shape = self.load_graph(graph_path, row_ind, col_ind)
+        if reverse_path is None:
+            self.p_mat = self.algorithm(algorithm, params, is_normalized=True)
+        else:
+            self.p_mat, self.reverse_p_mat = self.algorithm(algorithm, params, is_normalized=True, both_directions=True)
         self.save_res(path)
+        if reverse_path is not None:
+            self.save_res(reverse_path, reverse=True)
 
     def load_graph(self, file, row_ind=0, col_ind=1):
         """
-        Load the bipartite graph and the shape of its biadjacency matrix
+        Load the weighted biadjacency matrix of the bipartite graph and its shape. The solvers use the matrix directly;
+        the networkx graph is built from it only when needed (see graph).
         :param file: The path to a csv file of the weighted biadjacency matrices.
         :param row_ind: index of rows in csv file.
         :param col_ind: index of columns in csv file.
-        :return: A networkx Graph and a numpy array of the bipartite weight matrices.
+        :return: The biadjacency matrix, as a CSR matrix, and its shape.
         """
         data = pd.read_csv(file, header=None)
         rows = data[row_ind]
@@ -65,14 +75,29 @@ class MatchingProblem:
             M = csr_matrix((w, (rows, columns)))
         except Exception:
             self.is_mapped = True
-            self._char_to_num_row, self._num_to_char_row = self.create_mapping(data, 0)
-            self._char_to_num_col, self._num_to_char_col = self.create_mapping(data, 1)
-            rows = rows.apply(lambda x: self._char_to_num_row[x]).values
-            columns = columns.apply(lambda x: self._char_to_num_col[x]).values
+            self._char_to_num_row, self._num_to_char_row = self.create_mapping(data, row_ind)
+            self._char_to_num_col, self._num_to_char_col = self.create_mapping(data, col_ind)
+            rows = rows.map(self._char_to_num_row).values
+            columns = columns.map(self._char_to_num_col).values
             M = csr_matrix((w, (rows, columns)))
-        graph = nx.algorithms.bipartite.from_biadjacency_matrix(M)
-        # instead of size maybe return biadj_matrix?
-        return graph, M.shape
+        return M, M.shape
+
+    @property
+    def graph(self):
+        """
+        The bipartite graph as a networkx Graph (vertices 0, ..., n-1 of the rows and n, ..., n+m-1 of the columns),
+        built from the biadjacency matrix on first use. Only visualize_results needs it.
+        """
+        if self._graph is None:
+            self._graph = nx.algorithms.bipartite.from_biadjacency_matrix(self.biadjacency)
+        return self._graph
+
+    def full_adjacency(self):
+        """
+        The full adjacency matrix [[0, B], [B^T, 0]] of the bipartite graph, where B is the biadjacency matrix, as a
+        CSR matrix. Its vertices are ordered as in graph.
+        """
+        return bmat([[None, self.biadjacency], [self.biadjacency.T, None]], format="csr")
 
     @staticmethod
     def create_mapping(df, col):
@@ -85,7 +110,7 @@ class MatchingProblem:
             num_to_char[i] = c
         return char_to_num, num_to_char
 
-    def algorithm(self, algorithm, params, is_normalized=True):
+    def algorithm(self, algorithm, params, is_normalized=True, both_directions=False):
         """
         Import and implement the requested algorithm, to create a probability matrices of the same dimensions as the
         biadjacency matrices, where the (i, j)-th element represents the probability that the vertex i of the first side
@@ -95,7 +120,9 @@ class MatchingProblem:
         :param algorithm: The string indicating which algorithm to run. Can be one of the following four:
                "deg_update", "flow_analytic", "flow_numeric" or "null_model".
         :param params: The dictionary of the parameters required for the algorithm.
-        :return: The final probability matrices p
+        :param both_directions: Whether to return also the probability matrix of the reversed problem (from the
+               second side to the first).
+        :return: The final probability matrices p (and the reversed one, if both_directions)
         """
         if algorithm == "flow_analytic":
             from BipartiteProbabilisticMatching.flow_analytic import algorithm
@@ -103,6 +130,8 @@ class MatchingProblem:
             from BipartiteProbabilisticMatching.flow_numeric import algorithm
         elif algorithm == "null_model":
             from BipartiteProbabilisticMatching.null_model import algorithm
+        if both_directions:
+            return algorithm(self, params, is_normalized=is_normalized, both_directions=True)
         p = algorithm(self, params, is_normalized=is_normalized)
         return p
 
@@ -202,15 +231,30 @@ class MatchingProblem:
                         bottom=False, top=False, labelbottom=False, right=False, left=False, labelleft=False)
         plt.savefig(saving_path)
 
-    def save_res(self, path):
-        if self.is_mapped:
-            edges = [(self._num_to_char_row[i], self._num_to_char_col[j], self.p_mat[i, j]) for i, j in
-                     zip(*self.p_mat.nonzero())]
+    def save_res(self, path, reverse=False):
+        p_mat = self.reverse_p_mat if reverse else self.p_mat
+        if issparse(p_mat):
+            p = p_mat.tocoo()
+            nonzero = p.data != 0
+            sources, targets, probabilities = p.row[nonzero], p.col[nonzero], p.data[nonzero]
         else:
-            edges = [(i, j, self.p_mat[i, j]) for i, j in zip(*self.p_mat.nonzero())]
-        df = pd.DataFrame(edges, columns=["Source", "Target", "Probability"])
+            sources, targets = np.asarray(p_mat).nonzero()
+            probabilities = np.asarray(p_mat)[sources, targets]
+        if self.is_mapped:
+            num_to_char_row, num_to_char_col = self._num_to_char_row, self._num_to_char_col
+            if reverse:
+                num_to_char_row, num_to_char_col = num_to_char_col, num_to_char_row
+            sources = self._labels(num_to_char_row)[sources]
+            targets = self._labels(num_to_char_col)[targets]
+        df = pd.DataFrame({"Source": sources, "Target": targets, "Probability": probabilities})
         df.to_csv(path, index=False)
 
+    @staticmethod
+    def _labels(num_to_char):
+        labels = np.empty(len(num_to_char), dtype=object)
+        labels[:] = [num_to_char[i] for i in range(len(num_to_char))]
+        return labels
+
 
 def running_time():
     sizes = [10, 100, 500, 800, 1000, 3000, 5000, 8000, 10000, 12000, 15000, 18000, 20000] + list(
@@ -264,8 +308,8 @@ def task1(file_names, first_stage_saving_paths, first_stage_params):
     for graph_path, first_saving_path in zip(file_names, first_stage_saving_paths):
         first_saving_path_01 = first_saving_path[:-4] + "_01" + first_saving_path[-4:]
         first_saving_path_10 = first_saving_path[:-4] + "_10" + first_saving_path[-4:]
-        MatchingProblem(graph_path, "flow_numeric", first_stage_params, first_saving_path_01, row_ind=0, col_ind=1)
-        MatchingProblem(graph_path, "flow_numeric", first_stage_params, first_saving_path_10, row_ind=1, col_ind=0)
+        MatchingProblem(graph_path, "flow_numeric", first_stage_params, first_saving_path_01, row_ind=0, col_ind=1,
+                        reverse_path=first_saving_path_10)
     end = time.time()
     # plot_toy_graphs(file_names=file_names, name="small", graphs_directions=[(0, 1)], problem=[4, 16])
     # plot_toy_graphs(file_names=[first_saving_path_01], name="small_01", directed=True, graphs_directions=[(0, 1)], header=True, integer=False, problem=[0.18, 0.79])
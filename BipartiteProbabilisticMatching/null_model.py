@@ -4,32 +4,33 @@ From the weight matrix, we produce a matrix p.
 For each row in w, we build a row in p, in which p_ij = 0 if w_ij is not maximal in row i, and otherwise
 p_ij = 1 / (number of maxima).
 """
-import networkx as nx
 import numpy as np
 from scipy import sparse
 
 from BipartiteProbabilisticMatching.matching_solutions import MatchingProblem
 
 
-def algorithm(mp: MatchingProblem, params=None, is_normalized=None):
+def algorithm(mp: MatchingProblem, params=None, is_normalized=None, both_directions=False):
     """
     The implementation of the null model algorithm.
     :param mp: The main class containing the graph and its biadjacency matrix, on which we want to apply the algorithm.
-    The algorithm uses the biadjacency weight matrix only.
+    The algorithm uses the biadjacency weight matrix only, row by row (a 1 at the first maximum of every row).
     :param params: We will not use it anyway
-    :return: The final probability matrix p.
+    :param both_directions: Whether to return also the matrix of the reversed problem (the maxima of the columns).
+    :return: The final probability matrix p (and the reversed one, if both_directions).
     """
-    w = nx.to_scipy_sparse_matrix(mp.graph)#.toarray()
+    if both_directions:
+        return row_maxima(mp.biadjacency), row_maxima(mp.biadjacency.T.tocsr())
+    return row_maxima(mp.biadjacency)
 
-    p = sparse.csr_matrix((w.shape))
-    for i in range(mp.shape[0]):
-        if w[i, :].max() == 0:
-            continue
 
-        p[i, np.argmax(w[i, :])] = 1
-        # s = np.sum(p[i, :])
-        # if s:
-        #     p[i, :] = np.divide(p[i, :], s)
-    # p = nx.to_scipy_sparse_matrix(p)
-    p = p[:mp.shape[0], mp.shape[0]:]
+def row_maxima(w):
+    """
+    :param w: A sparse weight matrix.
+    :return: A sparse matrix with a 1 at the first maximum of every row of w with a nonzero maximum.
+    """
+    maxima = w.max(axis=1).toarray().ravel()
+    rows = np.flatnonzero(maxima != 0)
+    columns = np.asarray(w.argmax(axis=1)).ravel()[rows]
+    p = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=w.shape)
     return p
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath('.'))
+
+from lol_graph import LolGraph, read_edges_csv, STORAGE_MODES
+from lol_graph_directed import DLGW
+from multipartite_lol_graph import MultipartiteLol
+
+try:
+    import networkx as nx
+except ImportError:
+    nx = None
+
+"""
+#### README ####
+A benchmark of the graph classes (LolGraph, DLGW, MultipartiteLol and networkx) on synthetic multipartite graphs.
+For every size (number of edges) a graph is generated and written as task files (one csv of edges for every
+direction between two groups), and every backend is built from these files and then queried.
+
+Every (backend, storage, size) is one json line, with:
+ - build_seconds, build_peak_bytes, graph_bytes: time of reading the files and building the graph, the peak of the
+   memory allocated while building and the memory still held after it (tracemalloc).
+ - neighbors_per_second, edge_lookups_per_second, degrees_per_second: random neighbors(), get_edge_data() (half of
+   the pairs are edges) and out_degree() calls.
+ - convert_back_seconds: the time of getting all the edges back as a list.
+
+Run from the Magnet directory, for example:
+    python -m Code.benchmark --sizes 1e3 1e4 1e5 --output benchmark.jsonl
+    python -m Code.benchmark --sizes 1e3 1e4 1e5 --compare benchmark.jsonl
+With --compare the results are checked against an earlier output, and the exit code is 1 if some measure got
+worse by more than --tolerance.
+"""
+
+BACKENDS = ("LolGraph", "DLGW", "MultipartiteLol", "networkx")
+DEFAULT_SIZES = (1e3, 1e4, 1e5, 1e6, 1e7)
+# networkx needs about 1KB for every edge, so it is skipped above this size unless asked for
+NETWORKX_MAX_EDGES = 1000000
+# measures where a larger value is better, for --compare
+HIGHER_IS_BETTER = ("neighbors_per_second", "edge_lookups_per_second", "degrees_per_second")
+LOWER_IS_BETTER = ("build_seconds", "build_peak_bytes", "graph_bytes", "convert_back_seconds")
+
+
+# a multipartite graph with groups_number groups of the same size, as {(source group, target group): (sources,
+# targets, weights)} for every two different groups. ids are 0, 1, ..., nodes - 1 in every group and node i of one
+# group is the true match of node i of every other group: it gets a heavy edge to it, and degree - 1 light edges to
+# random nodes of the other group. The number of edges in all the directions together is about num_edges.
+def synthetic_multipartite_graph(num_edges, groups_number=3, degree=10, seed=0):
+    rng = np.random.default_rng(seed)
+    directions = [(a, b) for a in range(groups_number) for b in range(groups_number) if a != b]
+    degree = max(1, min(degree, int(num_edges) // len(directions)))
+    nodes = max(1, int(num_edges) // (len(directions) * degree))
+    graph = {}
+    for direction in directions:
+        sources = np.repeat(np.arange(nodes, dtype=np.int64), degree)
+        targets = rng.integers(0, nodes, size=len(sources))
+        weights = rng.uniform(0, 0.5, size=len(sources))
+        '''the first edge of every node is its true match'''
+        targets[::degree] = np.arange(nodes)
+        weights[::degree] = rng.uniform(0.5, 1, size=nodes)
+        '''a noise edge that hit the true match (or another noise edge) is dropped, like in the task files'''
+        pairs = pd.DataFrame({"source": sources, "target": targets}).duplicated().to_numpy()
+        graph[direction] = (sources[~pairs], targets[~pairs], weights[~pairs])
+    return graph
+
+
+# write the graph of synthetic_multipartite_graph into csv files (source,target,weight) named "<a>_<b>.csv" in
+# directory. returns the files and their directions, as convert_with_csv of MultipartiteLol takes them.
+def write_graph_files(graph, directory, chunksize=1000000):
+    files, directions = [], []
+    for (a, b), (sources, targets, weights) in graph.items():
+        file_name = os.path.join(directory, f"{a}_{b}.csv")
+        with open(file_name, "w", newline='') as f:
+            f.write("source,target,weight\n")
+            for start in range(0, len(sources), chunksize):
+                end = start + chunksize
+                pd.DataFrame({"source": sources[start:end], "target": targets[start:end],
+                              "weight": weights[start:end]}).to_csv(f, header=False, index=False)
+        files.append(file_name)
+        directions.append((a, b))
+    return files, directions
+
+
+# read the files into one (sources, targets, weights), the node i of group g is numbered g * stride + i
+def read_graph_files(files, directions, stride):
+    columns = [read_edges_csv(file) for file in files]
+    sources = np.concatenate([s + a * stride for (s, _, _), (a, _) in zip(columns, directions)])
+    targets = np.concatenate([t + b * stride for (_, t, _), (_, b) in zip(columns, directions)])
+    weights = np.concatenate([w for _, _, w in columns])
+    return sources, targets, weights
+
+
+def build_graph(backend, storage, files, directions, stride):
+    if backend == "MultipartiteLol":
+        graph = MultipartiteLol(storage=storage)
+        graph.convert_with_csv(files, directions)
+        return graph
+    sources, targets, weights = read_graph_files(files, directions, stride)
+    if backend == "LolGraph":
+        graph = LolGraph(directed=True, storage=storage)
+        graph.convert_from_arrays(sources, targets, weights)
+    elif backend == "DLGW":
+        graph = DLGW(storage=storage)
+        graph.convert_from_arrays(sources, targets, weights)
+    else:
+        graph = nx.DiGraph()
+        graph.add_weighted_edges_from(zip(sources.tolist(), targets.tolist(), weights.tolist()))
+    return graph
+
+
+# the name of the node (group, i) in the graph of the backend
+def node_name(backend, group, i, stride):
+    if backend == "MultipartiteLol":
+        return f"{group}_{i}"
+    return group * stride + i
+
+
+# random queries on the graph: nodes for neighbors and out_degree, and pairs for get_edge_data (half of them edges)
+def sample_queries(graph_edges, groups_number, nodes, queries, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    directions = list(graph_edges)
+    node_groups = rng.integers(0, groups_number, size=queries)
+    node_ids = rng.integers(0, nodes, size=queries)
+    pairs = []
+    for k in range(queries):
+        a, b = directions[rng.integers(0, len(directions))]
+        if k % 2 == 0:
+            sources, targets, _ = graph_edges[(a, b)]
+            edge = rng.integers(0, len(sources))
+            pairs.append((a, int(sources[edge]), b, int(targets[edge])))
+        else:
+            pairs.append((a, int(rng.integers(0, nodes)), b, int(rng.integers(0, nodes))))
+    return list(zip(node_groups.tolist(), node_ids.tolist())), pairs
+
+
+# calls per second of call on every item of items
+def throughput(call, items):
+    start = time.perf_counter()
+    for item in items:
+        call(item)
+    return len(items) / max(time.perf_counter() - start, 1e-9)
+
+
+def measure(backend, storage, files, directions, stride, nodes, queries):
+    record = {}
+    '''the time is measured without tracemalloc, that slows allocations down'''
+    start = time.perf_counter()
+    graph = build_graph(backend, storage, files, directions, stride)
+    record["build_seconds"] = time.perf_counter() - start
+    del graph
+
+    tracemalloc.start()
+    graph = build_graph(backend, storage, files, directions, stride)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    record["build_peak_bytes"] = peak
+    record["graph_bytes"] = current
+
+    node_queries, pair_queries = queries
+    nodes_names = [node_name(backend, group, i, stride) for group, i in node_queries]
+    pairs_names = [(node_name(backend, a, i, stride), node_name(backend, b, j, stride)) for a, i, b, j in pair_queries]
+    if backend == "networkx":
+        record["neighbors_per_second"] = throughput(lambda node: list(graph.adj[node].items()), nodes_names)
+        record["edge_lookups_per_second"] = throughput(lambda pair: graph.get_edge_data(*pair), pairs_names)
+        record["degrees_per_second"] = throughput(lambda node: graph.out_degree(node, weight="weight"), nodes_names)
+        start = time.perf_counter()
+        list(map(list, graph.edges(data="weight")))
+    else:
+        record["neighbors_per_second"] = throughput(graph.neighbors, nodes_names)
+        record["edge_lookups_per_second"] = throughput(lambda pair: graph.get_edge_data(*pair), pairs_names)
+        record["degrees_per_second"] = throughput(graph.out_degree, nodes_names)
+        start = time.perf_counter()
+        graph.convert_back()
+    record["convert_back_seconds"] = time.perf_counter() - start
+    return record
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, backends=BACKENDS, storages=STORAGE_MODES, groups_number=3, degree=10,
+                  queries=10000, seed=0, networkx_max_edges=NETWORKX_MAX_EDGES, output=None):
+    environment = {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                   "networkx": nx.__version__ if nx is not None else None}
+    records = []
+    for size in sizes:
+        size = int(size)
+        graph_edges = synthetic_multipartite_graph(size, groups_number, degree, seed)
+        nodes = max(int(sources.max()) + 1 for sources, _, _ in graph_edges.values())
+        num_edges = sum(len(sources) for sources, _, _ in graph_edges.values())
+        queries_lists = sample_queries(graph_edges, groups_number, nodes, queries, seed)
+        with tempfile.TemporaryDirectory() as directory:
+            files, directions = write_graph_files(graph_edges, directory)
+            for backend in backends:
+                if backend == "networkx" and (nx is None or num_edges > networkx_max_edges):
+                    continue
+                for storage in (storages if backend != "networkx" else [None]):
+                    record = {"backend": backend, "storage": storage, "size": size, "edges": num_edges,
+                              "nodes": nodes * groups_number, "groups_number": groups_number, "seed": seed}
+                    record.update(measure(backend, storage, files, directions, nodes, nodes, queries_lists))
+                    record.update(environment)
+                    records.append(record)
+                    print(json.dumps(record), flush=True)
+                    if output is not None:
+                        with open(output, "a") as f:
+                            f.write(json.dumps(record) + "\n")
+    return records
+
+
+# the measures of records that are worse than in baseline records (of the same backend, storage and size) by more
+# than tolerance, as a list of (record key, measure, baseline value, value)
+def compare_results(records, baseline, tolerance=0.2):
+    key = lambda record: (record["backend"], record["storage"], record["size"])
+    baseline = {key(record): record for record in baseline}
+    regressions = []
+    for record in records:
+        old = baseline.get(key(record))
+        if old is None:
+            continue
+        for measure in HIGHER_IS_BETTER:
+            if record[measure] < old[measure] * (1 - tolerance):
+                regressions.append((key(record), measure, old[measure], record[measure]))
+        for measure in LOWER_IS_BETTER:
+            if record[measure] > old[measure] * (1 + tolerance):
+                regressions.append((key(record), measure, old[measure], record[measure]))
+    return regressions
+
+
+def read_results(file_name):
+    with open(file_name, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LolGraph, DLGW, MultipartiteLol and networkx")
+    parser.add_argument("--sizes", nargs="+", type=float, default=DEFAULT_SIZES, help="numbers of edges")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--storages", nargs="+", choices=STORAGE_MODES, default=STORAGE_MODES)
+    parser.add_argument("--groups", type=int, default=3, help="number of groups of the graph")
+    parser.add_argument("--degree", type=int, default=10, help="out edges of every node to every other group")
+    parser.add_argument("--queries", type=int, default=10000, help="number of calls of every query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--networkx-max-edges", type=float, default=NETWORKX_MAX_EDGES)
+    parser.add_argument("--output", help="json lines file to append the results to")
+    parser.add_argument("--compare", help="json lines file of earlier results to check the results against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change for --compare")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    records = run_benchmark(args.sizes, args.backends, args.storages, args.groups, args.degree, args.queries,
+                            args.seed, args.networkx_max_edges, args.output)
+    if args.compare:
+        regressions = compare_results(records, read_results(args.compare), args.tolerance)
+        for (backend, storage, size), measure, old, new in regressions:
+            print(f"REGRESSION {backend} [{storage}] {size} edges: {measure} {old:.4g} -> {new:.4g}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
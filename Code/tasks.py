@@ -145,8 +145,8 @@ class BipartiteProbabilisticMatchingTask(Task):
         for graph_path, first_saving_path in zip(graph_params.files, self.results_files):
             first_saving_path_01 = first_saving_path[:-4] + "_01" + first_saving_path[-4:]
             first_saving_path_10 = first_saving_path[:-4] + "_10" + first_saving_path[-4:]
-            MatchingProblem(graph_path, "flow_numeric", first_stage_params, first_saving_path_01, row_ind=0, col_ind=1)
-            MatchingProblem(graph_path, "flow_numeric", first_stage_params, first_saving_path_10, row_ind=1, col_ind=0)
+            MatchingProblem(graph_path, "flow_numeric", first_stage_params, first_saving_path_01, row_ind=0, col_ind=1,
+                            reverse_path=first_saving_path_10)
 
         # plot_toy_graphs(file_names=file_names, name="small", graphs_directions=[(0, 1)], problem=[4, 16])
         # plot_toy_graphs(file_names=[first_saving_path_01], name="small_01", directed=True, graphs_directions=[(0, 1)], header=True, integer=False, problem=[0.18, 0.79])
@@ -275,8 +275,10 @@ class MultipartiteCommunityDetectionTask(Task):
         np.random.seed(42)
 
         if lol:
-            graph = MultipartiteLol()
-            graph.convert_with_csv(graph_params.files, graph_params.from_to_ids)
+            graph = MultipartiteLol(interned=True)
+            graph.convert_with_csv(graph_params.files, graph_params.from_to_ids,
+                                   cutoff=self.task_params.get('cutoff'), top_k=self.task_params.get('top_k'),
+                                   reorder=self.task_params.get('reorder'))
             graph.set_nodes_type_dict()
         else:
             graph = load_graph_from_files(graph_params.files, graph_params.from_to_ids, has_title=True, cutoff=0.0)
@@ -427,7 +429,10 @@ class PathwayProbabilitiesCalculationTask(Task):
         results_file = self.results_files[0]
         open(results_file, 'w').close()
         list_of_list_graph = MultipartiteLol()
-        list_of_list_graph.convert_with_csv(graph_params.files, graph_params.from_to_ids)
+        list_of_list_graph.convert_with_csv(graph_params.files, graph_params.from_to_ids,
+                                            cutoff=self.task_params.get('cutoff'),
+                                            top_k=self.task_params.get('top_k'),
+                                            reorder=self.task_params.get('reorder'))
         list_of_list_graph.set_nodes_type_dict()
         nodes = list_of_list_graph.nodes()
         starting_points = self.task_params.get('starting_points', 999999999999999999999999999)
@@ -0,0 +1,185 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+"""
+#### README ####
+A python (numpy) version of Make_Hackaton_Sim_Comb.m and Choose_Part.m, that makes the simulation graphs.
+
+A simulation graph has groups_number groups (networks) of n_users nodes, and a bipartite graph between every two
+groups. Node i of one group truly matches node i of every other group: there is an edge (i, i) with the weight
+of user i, 10 ** (rand * use_span). Every node i also gets ceil(n_users * rand * false_num) false edges, all with
+the weight round(weight of a random user * false_mass * rand). Then a user_removed_frac of the targets (users)
+and a comp_removed_frac of the sources (computers) lose all their edges.
+
+The graphs are written in the layout of Results/data, with the (1 based) ids and no header, like csvwrite:
+    <results_root>/data/<data_name>/<graph_id>_<data_name>/<graph_id>_<data_name>_graph_<k>.csv
+and, with write_real=True, the true matches that were not removed:
+    <results_root>/real_data/<data_name>/<graph_id>_<data_name>/<graph_id>_<data_name>_real_graph_<k>.csv
+The rows of the graph are made and written chunk_rows at a time, so only a chunk of the edges is in memory.
+The graphs depend only on the seed and on chunk_rows.
+The files hold the same edges as the .m files would, but not in the same text:
+- the edges are ordered by source and then target (row by row, as the chunks are made), while find() in MATLAB
+  lists them by target and then source.
+- integer weights are written as integers, like csvwrite, and the others with all their digits, where csvwrite
+  keeps only 5 significant digits.
+
+The simulation families of run_tasks.full_run change one parameter (the graph id is its value), for example:
+    python GenerateGraphs/generate_graphs.py false_mass 1 2 5 10 --n-users 1000
+"""
+
+DEFAULT_PARAMS = {"n_users": 1000, "false_mass": 1., "false_num": 0.01, "user_removed_frac": 0.,
+                  "comp_removed_frac": 0., "use_span": 1.}
+# the parameters changed by every family of simulation graphs
+FAMILIES = {"false_mass": ("false_mass",), "noisy_edges": ("false_num",),
+            "removed_nodes": ("user_removed_frac", "comp_removed_frac"), "nodes": ("n_users",)}
+CHUNK_ROWS = 100000
+
+
+# like Choose_Part.m: a random ceil(n_users * frac) of the numbers 0, ..., n_users - 1
+def choose_part(rng, n_users, frac):
+    return rng.permutation(n_users)[:int(np.ceil(n_users * frac))]
+
+
+# for every row r, counts[r] different random columns of 0, ..., n_columns - 1 (as in Choose_Part.m).
+# returns the rows and the columns, sorted by row and column.
+def choose_parts(rng, n_columns, counts):
+    counts = np.minimum(counts, n_columns)
+    '''rows that take most of the columns are permuted one by one, the rest are drawn and drawn again on repeats'''
+    full = np.flatnonzero(counts > n_columns // 2)
+    rows = [np.repeat(full, counts[full])]
+    columns = [np.concatenate([rng.permutation(n_columns)[:counts[row]] for row in full]).astype(np.int64)
+               if len(full) else np.zeros(0, dtype=np.int64)]
+    missing = counts.copy()
+    missing[full] = 0
+    keys = np.zeros(0, dtype=np.int64)
+    while missing.any():
+        new_rows = np.repeat(np.arange(len(counts)), missing)
+        keys = np.unique(np.concatenate((keys, new_rows * n_columns + rng.integers(0, n_columns, len(new_rows)))))
+        missing = counts - np.bincount(keys // n_columns, minlength=len(counts))
+        missing[full] = 0
+    rows.append(keys // n_columns)
+    columns.append(keys % n_columns)
+    rows, columns = np.concatenate(rows), np.concatenate(columns)
+    order = np.lexsort((columns, rows))
+    return rows[order], columns[order]
+
+
+# the edges of the rows first, ..., last - 1 of one bipartite graph, as (sources, targets, weights) and the true
+# matches kept, as (sources, targets)
+def make_rows(rng, first, last, weight_user, false_mass, false_num, users_kept, comps_kept):
+    n_users = len(weight_user)
+    rows = np.arange(first, last)
+    counts = np.ceil(n_users * rng.random(len(rows)) * false_num).astype(np.int64)
+    false_rows, false_columns = choose_parts(rng, n_users, counts)
+    false_rows += first
+    '''every false edge of a row gets the same weight, the assignment of the last k in the loop of the .m file'''
+    row_weights = weight_user[rng.integers(0, n_users, len(rows))] * false_mass * rng.random(len(rows))
+    false_weights = np.floor(row_weights + 0.5)[false_rows - first]
+
+    '''a false edge (i, i) replaces the true one'''
+    weights = weight_user[first:last].copy()
+    on_diagonal = false_rows == false_columns
+    weights[false_rows[on_diagonal] - first] = false_weights[on_diagonal]
+    sources = np.concatenate((rows, false_rows[~on_diagonal]))
+    targets = np.concatenate((rows, false_columns[~on_diagonal]))
+    weights = np.concatenate((weights, false_weights[~on_diagonal]))
+
+    keep = users_kept[targets] & comps_kept[sources] & (weights > 0)
+    order = np.lexsort((targets[keep], sources[keep]))
+    real = rows[users_kept[rows] & comps_kept[rows]]
+    return (sources[keep][order], targets[keep][order], weights[keep][order]), (real, real)
+
+
+# integer weights as integers (3, not 3.0), like csvwrite, the others as the shortest text that reads back the same
+def weights_text(weights):
+    text = weights.astype(str)
+    integral = weights == np.floor(weights)
+    text[integral] = weights[integral].astype(np.int64).astype(str)
+    return text
+
+
+def write_edges(f, sources, targets, weights=None):
+    columns = {"source": sources + 1, "target": targets + 1}
+    if weights is not None:
+        columns["weight"] = weights_text(weights)
+    pd.DataFrame(columns).to_csv(f, header=False, index=False)
+
+
+# like Make_Hackaton_Sim_Comb.m, for the graph named "<graph_id>_<data_name>". returns the files of the graphs.
+def make_hackaton_sim_comb(data_name, graph_id, n_users=DEFAULT_PARAMS["n_users"],
+                           false_mass=DEFAULT_PARAMS["false_mass"], false_num=DEFAULT_PARAMS["false_num"],
+                           user_removed_frac=DEFAULT_PARAMS["user_removed_frac"],
+                           comp_removed_frac=DEFAULT_PARAMS["comp_removed_frac"],
+                           use_span=DEFAULT_PARAMS["use_span"], groups_number=3, results_root="Results", seed=0,
+                           write_real=False, chunk_rows=CHUNK_ROWS):
+    n_users = int(n_users)
+    name = f"{graph_id}_{data_name}"
+    graph_dir = os.path.join(results_root, "data", data_name, name)
+    real_dir = os.path.join(results_root, "real_data", data_name, name)
+    os.makedirs(graph_dir, exist_ok=True)
+    if write_real:
+        os.makedirs(real_dir, exist_ok=True)
+
+    seeds = np.random.SeedSequence(seed).spawn(groups_number * (groups_number - 1) // 2)
+    files = []
+    for k, graph_seed in enumerate(seeds, start=1):
+        rng = np.random.default_rng(graph_seed)
+        weight_user = 10. ** (rng.random(n_users) * use_span)
+        users_kept = np.ones(n_users, dtype=bool)
+        users_kept[choose_part(rng, n_users, user_removed_frac)] = False
+        comps_kept = np.ones(n_users, dtype=bool)
+        comps_kept[choose_part(rng, n_users, comp_removed_frac)] = False
+
+        file_name = os.path.join(graph_dir, f"{name}_graph_{k}.csv")
+        real_file_name = os.path.join(real_dir, f"{name}_real_graph_{k}.csv")
+        with open(file_name, "w", newline='') as f, \
+                (open(real_file_name, "w", newline='') if write_real else open(os.devnull, "w")) as real_f:
+            for first in range(0, n_users, chunk_rows):
+                edges, real = make_rows(rng, first, min(first + chunk_rows, n_users), weight_user, false_mass,
+                                        false_num, users_kept, comps_kept)
+                write_edges(f, *edges)
+                if write_real:
+                    write_edges(real_f, *real, np.ones(len(real[0])))
+        files.append(file_name)
+    return files
+
+
+# make the graphs of a simulation family (see FAMILIES), one for every value of its parameter
+def make_family(family, values, results_root="Results", seed=0, write_real=False, chunk_rows=CHUNK_ROWS, **params):
+    if family not in FAMILIES:
+        raise ValueError(f"Unknown family '{family}', expected one of {tuple(FAMILIES)}")
+    files = []
+    for i, value in enumerate(values):
+        graph_params = dict(DEFAULT_PARAMS, **params)
+        graph_params.update({param: value for param in FAMILIES[family]})
+        files += make_hackaton_sim_comb(family, value, results_root=results_root, seed=seed + i,
+                                        write_real=write_real, chunk_rows=chunk_rows, **graph_params)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Make the simulation graphs of Make_Hackaton_Sim_Comb.m")
+    parser.add_argument("family", choices=tuple(FAMILIES))
+    parser.add_argument("values", nargs="+", type=float, help="the values of the parameter of the family")
+    for param, default in DEFAULT_PARAMS.items():
+        parser.add_argument("--" + param.replace("_", "-"), type=type(default), default=default)
+    parser.add_argument("--groups", type=int, default=3, help="number of groups (networks)")
+    parser.add_argument("--results-root", default="Results")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real", action="store_true", help="write also the true matches into real_data")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    values = [int(value) if value.is_integer() else value for value in args.values]
+    params = {param: getattr(args, param) for param in DEFAULT_PARAMS}
+    for file in make_family(args.family, values, args.results_root, args.seed, args.real, args.chunk_rows,
+                            groups_number=args.groups, **params):
+        print(file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -116,15 +116,19 @@ def induced_graph(partition, graph, weight, nodetype):
     the same node in the resulting graph"""
     ret = MultipartiteLol(weighted=True)
     # ret.add_nodes_from(partition.values())
-    edges = {}
-    for node1, node2, edge_weight in graph.edges():
-        com1 = partition[node1]
-        com2 = partition[node2]
-        edges[(com1, com2)] = edges.get((com1, com2), 0) + edge_weight
-    edges_list = [[node1, node2, edges[(node1, node2)]] for node1, node2 in edges.keys()]
-    ret.convert(edges_list)
+    sources, targets, edge_weights = graph.edge_arrays(numbers=True)
+    if edge_weights is None:
+        edge_weights = np.ones(len(sources))
+    communities = np.array([partition[node] for node in graph.nodes()], dtype=np.int64)
+    com1, com2 = communities[sources], communities[targets]
+    # sum the weights of every (com1, com2) pair, the pairs are kept by order of first appearance
+    pairs, first_edges, pair_numbers = np.unique(com1 * (communities.max(initial=0) + 1) + com2, return_index=True,
+                                                 return_inverse=True)
+    pair_weights = np.bincount(pair_numbers.reshape(-1), weights=edge_weights, minlength=len(pairs))
+    order = np.argsort(first_edges)
+    ret.convert_from_arrays(com1[first_edges[order]], com2[first_edges[order]], pair_weights[order])
     ret.initialize_nodes_type_dict()
-    for node, data in graph.nodes_type_dict.items():
+    for node in graph.nodes():
         com = partition[node]
         com_data = ret.nodes_type_dict[com]
         if nodetype not in com_data:
@@ -221,10 +225,9 @@ def __neighcom(node, graph, status, weight_key):
             out_com = status.node2com[neighbor]
             weights_out[out_com] = weights_out.get(out_com, 0) + edge_weight
     weights_in = {}
-    x = graph.predecessors(node)
-    for neighbor in x:
+    x, edges_weights = graph.predecessors_and_weights(node)
+    for neighbor, edge_weight in zip(x, edges_weights):
         if neighbor != node:
-            edge_weight = graph.get_edge_data(neighbor, node).get(weight_key, 1)
             in_com = status.node2com[neighbor]
             weights_in[in_com] = weights_in.get(in_com, 0) + edge_weight
     return weights_in, weights_out
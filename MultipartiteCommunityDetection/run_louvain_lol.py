@@ -14,7 +14,7 @@ def partition_to_csv(graph, partition, filename):
         w = csv.writer(f)
         w.writerow(["Node", "Type", "Community"])
         for v, c in partition.items():
-            w.writerow([v.split("_")[1], np.argmax(graph.return_node_type(v)), c])
+            w.writerow([graph.node_label(v).split("_")[1], np.argmax(graph.return_node_type(v)), c])
         # print("---LOL---")
         # check_accuracy(partition)
 
@@ -61,14 +61,15 @@ def run_louvain(graph, dump_name, res, beta, assess=True, ground_truth=None, dra
 def greedy_partition(graph):
     groups, partition = [], {}
     for node in graph.nodes():
-        if node[0] != '0':
+        if graph.node_group(node) != 0:
             continue
-        neighbors_shapes = [str(i) for i in range(graph.groups_number) if str(i) != node[0]]
+        neighbors_shapes = [i for i in range(graph.groups_number) if i != 0]
         neighbors = graph.neighbors(node)
+        neighbors_groups = [graph.node_group(neighbor) for neighbor in neighbors[0]]
         neighbors_dict = {}
         for shape in neighbors_shapes:
-            shape_neighbors = [neighbor for neighbor in neighbors[0] if neighbor[0] == shape]
-            shape_weights = [weight for neighbor, weight in zip(*neighbors) if neighbor[0] == shape]
+            shape_neighbors = [neighbor for neighbor, group in zip(neighbors[0], neighbors_groups) if group == shape]
+            shape_weights = [weight for weight, group in zip(neighbors[1], neighbors_groups) if group == shape]
             if len(shape_neighbors) > 0:
                 neighbors_dict[shape] = (shape_neighbors, shape_weights)
 
@@ -33,11 +33,14 @@ class Status_Lol(object):
         self.g_out_degrees = {}
         self.internals = {}
         self.total_weight = round(graph.size(), round_num)
+        nodes = graph.nodes()
+        in_degrees = graph.in_degrees().tolist()
+        out_degrees = graph.out_degrees().tolist()
         if part is None:
-            for node in graph.nodes():
+            for node, in_deg, out_deg in zip(nodes, in_degrees, out_degrees):
                 self.node2com[node] = count
-                in_deg = round(float(graph.in_degree(node)), round_num)
-                out_deg = round(float(graph.out_degree(node)),round_num)
+                in_deg = round(float(in_deg), round_num)
+                out_deg = round(float(out_deg), round_num)
                 com_type = graph.return_node_type(node)
                 if any([in_deg < 0, out_deg < 0]):
                     raise ValueError(f"Bad node degree for node ({node})")
@@ -51,11 +54,11 @@ class Status_Lol(object):
                 self.internals[count] = self.loops[node]
                 count += 1
         else:
-            for node in graph.nodes():
+            for node, in_deg in zip(nodes, in_degrees):
                 com = part[node]
                 self.node2com[node] = com
-                in_deg = round(float(graph.in_degree(node)), round_num)
-                out_deg = round(float(graph.in_degree(node)), round_num)
+                in_deg = round(float(in_deg), round_num)
+                out_deg = in_deg
                 com_type = graph.return_node_type(node)
                 if com not in self.com_nodes:
                     self.com_nodes[com] = com_type
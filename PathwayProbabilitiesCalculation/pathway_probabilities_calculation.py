@@ -1,4 +1,5 @@
 import itertools
+import csv
 import time
 from queue import Queue
 import copy
@@ -1,20 +1,704 @@
 import os
+import operator
 import numpy as np
+import pandas as pd
 from collections import OrderedDict
-import csv
+from collections.abc import Mapping, ItemsView, Sequence
 import sys
+import json
+import struct
+from bisect import bisect_left
+from multiprocessing import shared_memory, resource_tracker
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+# "list" keeps the three lists as python lists, "numpy" keeps them as contiguous numpy arrays (CSR), and
+# "compressed" keeps the index and weights as numpy arrays and the neighbors as varint row deltas (see
+# CompressedNeighbors), for graphs that do not fit in memory otherwise. With dtypes={"weights": np.float16} the
+# weights take 2 bytes too.
+STORAGE_MODES = ("list", "numpy", "compressed")
+DEFAULT_DTYPES = {"index": np.int64, "neighbors": np.int32, "weights": np.float64}
+CSV_CHUNKSIZE = 1000000
+# read_edges_csv checks the text of integer ids in blocks of this many bytes
+CSV_BLOCK_BYTES = 1 << 26
+POWERS_OF_TEN = 10 ** np.arange(1, 19, dtype=np.int64)
+# below this number of pairs get_edge_data_many searches pair by pair, numpy calls cost more than they save
+VECTORIZED_LOOKUP_MIN = 64
+# below this number of bytes varint_decode decodes in python, for the same reason (rows are usually short)
+VECTORIZED_DECODE_MIN = 256
+# the binary file of save/load: magic, version, header length, json header, and the arrays (aligned) after it
+FILE_MAGIC = b"LOLGRAPH"
+FILE_VERSION = 1
+FILE_ALIGNMENT = 64
+# add_edges and remove_edges keep their changes in a delta (by source number) that reads merge in, until it holds
+# more than max(DELTA_COMPACT_MIN, DELTA_COMPACT_RATIO * entries in the lists) changes and is merged into the lists
+DELTA_COMPACT_MIN = 1024
+DELTA_COMPACT_RATIO = 0.05
+# the parts of a LolGraph that copies share until one of them changes it, see LolGraph.copy
+COPY_ON_WRITE_PARTS = ("index", "degrees", "nodes", "delta")
+# the orders reorder_nodes can number the nodes by, see _locality_order
+NODE_ORDERS = ("degree", "bfs", "rcm")
+# the shared memory blocks attached in this process, by name, see SharedGraph.attach and SharedGraph.detach
+ATTACHED_BLOCKS = {}
+
+
+# the node ids as a 1-d numpy array. A list of ids of different types (like ['a', 1]) or of ids that are not
+# numbers or strings (like tuples) becomes an object array of the ids themselves, np.asarray would turn them into
+# strings or add dimensions.
+def _ids_array(ids):
+    if isinstance(ids, np.ndarray):
+        return ids
+    ids = list(ids)
+    if ids and all(type(node) is int for node in (ids[0], ids[-1])):
+        '''the common case, a list of ints is one only if numpy made it into an int array'''
+        array = np.asarray(ids)
+        if array.ndim == 1 and array.dtype.kind in "iu":
+            return array
+    types = set(map(type, ids))
+    if len(types) <= 1 and all(issubclass(kind, (str, int, float, np.generic)) for kind in types):
+        return np.asarray(ids)
+    return np.fromiter(ids, dtype=object, count=len(ids))
+
+
+# number the distinct values by order of first appearance.
+# returns the number of every value and the distinct values, ordered by their numbers.
+def _factorize(values):
+    values = _ids_array(values)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64), values
+    if values.dtype == object:
+        '''a dict numbers any hashable ids (of mixed types, tuples) like the node maps do, np.unique can't sort them'''
+        first_numbers = {}
+        numbers = np.fromiter((first_numbers.setdefault(value, len(first_numbers)) for value in values),
+                              dtype=np.int64, count=len(values))
+        return numbers, np.fromiter(first_numbers, dtype=object, count=len(first_numbers))
+    uniques, first_index, inverse = np.unique(values, return_index=True, return_inverse=True)
+    order = np.argsort(first_index)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return rank[inverse.reshape(-1)], uniques[order]
+
+
+# the positions of values in nodes, which holds every node once
+def _lookup(nodes, values):
+    nodes, values = _ids_array(nodes), _ids_array(values)
+    if nodes.dtype == object or values.dtype == object:
+        numbers = {node: number for number, node in enumerate(nodes.tolist())}
+        try:
+            return np.fromiter((numbers[value] for value in values), dtype=np.int64, count=len(values))
+        except KeyError:
+            raise ValueError("Some of the edges nodes are not in nodes")
+    sorter = np.argsort(nodes, kind="stable")
+    positions = np.searchsorted(nodes, values, sorter=sorter).clip(max=max(len(nodes) - 1, 0))
+    numbers = sorter[positions] if len(nodes) else positions
+    if len(values) and (not len(nodes) or (nodes[numbers] != values).any()):
+        raise ValueError("Some of the edges nodes are not in nodes")
+    return numbers
+
+
+# a view of an array that can't be written to
+def _read_only(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+# the memory (in bytes) of objects and everything they hold: the items of lists, tuples, sets and dicts, the data of
+# numpy arrays (also of views and memory maps) and the attributes of the graph helper classes. Every object is counted
+# once, objects whose ids are in seen were counted already (seen is updated), and the small ints, None and bools that
+# python keeps only once are not counted.
+def deep_sizeof(*objects, seen=None):
+    seen = set() if seen is None else seen
+    total = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or obj is None or isinstance(obj, bool) or (type(obj) is int and -5 <= obj <= 256):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, np.ndarray):
+            if obj.base is not None:
+                '''getsizeof counts only the data an array owns'''
+                total += obj.nbytes
+            if obj.dtype == object:
+                stack.extend(obj.ravel().tolist())
+        elif isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, (IdentityNodeMap, LabelTable, CompressedNeighbors)):
+            stack.extend(vars(obj).values())
+    return total
+
+
+# the weighted out and in degrees (by node number) and the size of a set of edges given as arrays (see size).
+# bincount adds the weights of every node one by one in the edges order, as summing them in a loop would.
+def _edges_totals(sources, targets, weights, nodes_amount, directed=True):
+    if weights is None:
+        out_degrees = np.bincount(sources, minlength=nodes_amount)
+        in_degrees = np.bincount(targets, minlength=nodes_amount)
+        size = len(targets) if directed else len(targets) / 2
+        return out_degrees, in_degrees, size
+    out_degrees = np.bincount(sources, weights=weights, minlength=nodes_amount)
+    in_degrees = np.bincount(targets, weights=weights, minlength=nodes_amount)
+    if directed:
+        return out_degrees, in_degrees, weights.sum()
+    '''every undirected edge is in the lists twice (self loops once) and counts half of its weight (self loops all)'''
+    loops = sources == targets
+    return out_degrees, in_degrees, weights[loops].sum() + weights[~loops].sum() / 4
+
+
+# the edges (given by the numbers of their nodes) to keep when sparsifying a graph: the edges heavier than cutoff, and of
+# them only the top_k heaviest out edges of every node. Either may be None. Between edges of the same weight the one
+# to the target with the smaller number is kept, by target_numbers (the numbers of the targets when the graph was
+# built, the targets themselves if not given), so the same edges are kept whatever the edges order is.
+# In an undirected graph every edge is in the lists twice, and both are kept if one of its nodes keeps it.
+def _sparsify_mask(sources, targets, weights, cutoff=None, top_k=None, directed=True, target_numbers=None):
+    keep = np.ones(len(sources), dtype=bool) if cutoff is None else weights > cutoff
+    if top_k is not None:
+        if top_k < 0:
+            raise ValueError(f"top_k must not be negative, got {top_k}")
+        target_numbers = targets if target_numbers is None else target_numbers
+        kept = np.flatnonzero(keep)
+        order = kept[np.lexsort((target_numbers[kept], -weights[kept], sources[kept]))]
+        '''the rank of every edge between the out edges of its source, heaviest first'''
+        ordered_sources = sources[order]
+        group_starts = np.flatnonzero(np.r_[True, ordered_sources[1:] != ordered_sources[:-1]])
+        ranks = np.arange(len(order)) - np.repeat(group_starts, np.diff(np.r_[group_starts, len(order)]))
+        keep = np.zeros(len(sources), dtype=bool)
+        keep[order[ranks < top_k]] = True
+    if not directed:
+        nodes_amount = int(max(sources.max(initial=-1), targets.max(initial=-1))) + 1
+        keys = sources.astype(np.int64) * nodes_amount + targets
+        keep |= np.isin(targets.astype(np.int64) * nodes_amount + sources, keys[keep])
+    return keep
+
+
+# an order of the nodes (as for permute_nodes) that puts nodes which are used together close to each other:
+# "degree" - the heaviest nodes (most edges in and out) first, so the rows read most are together at the start.
+# "rcm" - reverse Cuthill-McKee of the edges (in both directions), neighbors get close numbers.
+# "bfs" - Cuthill-McKee, a breadth first order from a node of low degree in every component.
+def _locality_order(sources, targets, nodes_amount, method, directed=True):
+    if method not in NODE_ORDERS:
+        raise ValueError(f"Unknown order '{method}', expected one of {NODE_ORDERS}")
+    if method == "degree":
+        degrees = np.bincount(sources, minlength=nodes_amount)
+        if directed:
+            degrees += np.bincount(targets, minlength=nodes_amount)
+        return np.argsort(-degrees, kind="stable")
+    if nodes_amount == 0:
+        return np.zeros(0, dtype=np.int64)
+    adjacency = csr_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(nodes_amount,) * 2)
+    order = reverse_cuthill_mckee((adjacency + adjacency.T).tocsr(), symmetric_mode=True).astype(np.int64)
+    return order[::-1].copy() if method == "bfs" else order
+
+
+# write named numpy arrays and a json-able meta dict into one binary file.
+# every array starts at an aligned offset, so it can be memory mapped as is.
+def write_arrays_file(path, meta, arrays):
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout, size = arrays_layout(arrays)
+    header_bytes = json.dumps({"meta": meta, "arrays": layout}).encode("utf-8")
+    start = -(-(len(FILE_MAGIC) + 12 + len(header_bytes)) // FILE_ALIGNMENT) * FILE_ALIGNMENT
+    with open(path, "wb") as f:
+        f.write(FILE_MAGIC + struct.pack("<IQ", FILE_VERSION, start) + header_bytes)
+        for name, array in arrays.items():
+            f.seek(start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(start + size)
+
+
+# where every array is placed in one buffer: {name: {dtype, shape, offset}}, and the size of the buffer
+def arrays_layout(arrays):
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // FILE_ALIGNMENT) * FILE_ALIGNMENT
+    return layout, offset
+
+
+# read the meta dict and the arrays of a file written by write_arrays_file.
+# with mmap=True the arrays are copy on write memory maps of the file: nothing is read until it is used, and
+# changing them never changes the file.
+def read_arrays_file(path, mmap=True):
+    with open(path, "rb") as f:
+        if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+            raise ValueError(f"{path} is not a LolGraph file")
+        version, start = struct.unpack("<IQ", f.read(12))
+        if version > FILE_VERSION:
+            raise ValueError(f"{path} was saved in version {version}, only versions up to {FILE_VERSION} are known")
+        header = json.loads(f.read(start - len(FILE_MAGIC) - 12).rstrip(b"\0").decode("utf-8"))
+        arrays = {}
+        for name, info in header["arrays"].items():
+            dtype, shape = np.dtype(info["dtype"]), tuple(info["shape"])
+            if mmap and np.prod(shape) > 0:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="c", offset=start + info["offset"], shape=shape)
+            else:
+                f.seek(start + info["offset"])
+                arrays[name] = np.fromfile(f, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+    return header["meta"], arrays
+
+
+class SharedGraph:
+    """
+    A graph (LolGraph, DLGW or MultipartiteLol) published into one block of multiprocessing shared memory.
+    handle is small and can be sent to worker processes, which open the graph with SharedGraph.attach(handle)
+    without copying its arrays. The attached graphs are read only (changing them raises a ValueError, their
+    copies can be changed) and use numpy storage.
+    A process keeps the blocks it attached open after the attached graphs are gone, since the arrays and rows read
+    from them point into the block, until SharedGraph.detach(handle). Only the process that published the graph
+    removes the block, with unlink() (or in a with block) after the workers are done.
+    """
+    def __init__(self, graph):
+        meta, arrays = graph._to_arrays()
+        meta["storage"] = "numpy"
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+        layout, size = arrays_layout(arrays)
+        self._shared_memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, array in arrays.items():
+            np.ndarray(array.shape, dtype=array.dtype, buffer=self._shared_memory.buf,
+                       offset=layout[name]["offset"])[...] = array
+        self.handle = (type(graph), self._shared_memory.name, meta, layout)
+
+    # open the graph published with this handle, in any process
+    @staticmethod
+    def attach(handle):
+        graph_class, name, meta, layout = handle
+        block = ATTACHED_BLOCKS.get(name)
+        if block is None:
+            block = ATTACHED_BLOCKS[name] = SharedGraph._open_block(name)
+        arrays = {}
+        for array_name, info in layout.items():
+            '''frombuffer keeps the buffer of the block exported while the array (or a view of it) is alive'''
+            dtype, shape = np.dtype(info["dtype"]), tuple(info["shape"])
+            arrays[array_name] = np.frombuffer(block.buf, dtype=dtype, count=int(np.prod(shape)),
+                                               offset=info["offset"]).reshape(shape)
+            arrays[array_name].flags.writeable = False
+        graph = graph_class._restore(meta, arrays)
+        graph._shared_memory = block
+        return graph
+
+    # close the block of this handle in this process. Raises a BufferError (and keeps the block open) while arrays
+    # or rows of the graphs attached with it are still used.
+    @staticmethod
+    def detach(handle):
+        name = handle[1]
+        if name in ATTACHED_BLOCKS:
+            ATTACHED_BLOCKS[name].close()
+            del ATTACHED_BLOCKS[name]
+
+    # open an existing block without registering it to the resource tracker, which would remove it when the
+    # process exits (only the process that published the graph removes it)
+    @staticmethod
+    def _open_block(name):
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            pass
+        '''before python 3.13 (no track argument) opening a block always registers it. Unregistering it after that
+        would also drop the registration of the publishing process, as the processes share one tracker that keeps
+        the names in a set, so the registration of shared memory is skipped while the block is opened.'''
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+    # release the memory block in this process, the attached graphs of other processes keep working
+    def close(self):
+        self._shared_memory.close()
+
+    # free the memory block, after every process is done with the graph
+    def unlink(self):
+        self._shared_memory.close()
+        self._shared_memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlink()
+
+
+# node names as arrays for write_arrays_file: integers as one int64 array, strings as their utf-8 bytes and the
+# offsets of every name in them
+def encode_labels(labels, prefix=""):
+    if all(isinstance(label, (int, np.integer)) and not isinstance(label, bool) for label in labels):
+        return "int", {prefix + "labels": np.asarray(labels, dtype=np.int64)}
+    if not all(isinstance(label, str) for label in labels):
+        raise ValueError("Only graphs with str or int node names can be saved")
+    encoded = [label.encode("utf-8") for label in labels]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(label) for label in encoded], out=offsets[1:])
+    return "str", {prefix + "labels_data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                   prefix + "labels_offsets": offsets}
+
+
+class LabelTable(Sequence):
+    """
+    Node names saved by encode_labels as strings, decoded one by one when they are asked for.
+    Interned graphs loaded from a file use it as their names list, so loading does not decode all the names.
+    """
+    def __init__(self, data, offsets):
+        self._data = data
+        self._offsets = offsets
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return bytes(self._data[self._offsets[i]: self._offsets[i + 1]]).decode("utf-8")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def tolist(self):
+        data = bytes(self._data)
+        offsets = self._offsets.tolist()
+        return [data[offsets[i]: offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+# the sorted rows of a neighbors list as varints: in every row the first neighbor and then the differences between
+# consecutive neighbors, each in as few bytes as it needs (7 bits a byte, the high bit set on all but the last byte).
+# returns the bytes and where every row starts in them.
+def varint_encode(index_list, neighbors_list):
+    index_list = np.asarray(index_list, dtype=np.int64)
+    neighbors_list = np.asarray(neighbors_list, dtype=np.int64)
+    deltas = neighbors_list.copy()
+    deltas[1:] -= neighbors_list[:-1]
+    row_starts = index_list[:-1][np.diff(index_list) > 0]
+    deltas[row_starts] = neighbors_list[row_starts]
+    if (deltas < 0).any():
+        raise ValueError("Only sorted rows can be compressed")
+    lengths = np.ones(len(deltas), dtype=np.int64)
+    for k in range(1, 10):
+        more = (deltas >> (7 * k)) > 0
+        if not more.any():
+            break
+        lengths += more
+    ends = np.cumsum(lengths)
+    data = np.empty(ends[-1] if len(ends) else 0, dtype=np.uint8)
+    for k in range(lengths.max(initial=0)):
+        has_byte = lengths > k
+        data[ends[has_byte] - lengths[has_byte] + k] = ((deltas[has_byte] >> (7 * k)) & 0x7f) | \
+            np.where(lengths[has_byte] > k + 1, 0x80, 0)
+    offsets = np.concatenate(([0], ends))[index_list]
+    return data, offsets.astype(np.uint32) if len(data) < 1 << 32 else offsets
+
+
+# the numbers written by varint_encode in data (not yet summed into the neighbors)
+def varint_decode(data):
+    if len(data) < VECTORIZED_DECODE_MIN:
+        values = []
+        value = shift = 0
+        for byte in data.tobytes():
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                values.append(value)
+                value = shift = 0
+        return np.array(values, dtype=np.int64)
+    low = (data & 0x7f).astype(np.int64)
+    last_bytes = data < 0x80
+    if last_bytes.all():
+        return low
+    starts = np.flatnonzero(np.concatenate(([True], last_bytes[:-1])))
+    shifts = (np.arange(len(data)) - np.repeat(starts, np.diff(np.append(starts, len(data))))) * 7
+    return np.add.reduceat(low << shifts, starts)
+
+
+class CompressedNeighbors(Sequence):
+    """
+    The neighbors list of a graph with "compressed" storage, as the bytes of varint_encode.
+    Indexing and slicing it like the neighbors list decodes only the rows the positions are in (a slice of many rows
+    is decoded at once), into an int64 array. It keeps the index list it was made with, which is never changed in
+    place (rows added after it are empty).
+    """
+    def __init__(self, index_list, neighbors_list):
+        self._index = np.asarray(index_list, dtype=np.int64)
+        self._data, self._offsets = varint_encode(self._index, np.asarray(neighbors_list)[:self._index[-1]])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            values = self._decode(start, max(start, stop)) if step > 0 else self[:][i]
+            return values if step == 1 or step < 0 else values[::step]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("CompressedNeighbors index out of range")
+        return self._decode(i, i + 1)[0]
+
+    def __len__(self):
+        return int(self._index[-1])
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    # the neighbors at the positions start, ..., stop - 1
+    def _decode(self, start, stop):
+        if start >= stop:
+            return np.zeros(0, dtype=np.int64)
+        first = int(np.searchsorted(self._index, start, "right")) - 1
+        last = int(np.searchsorted(self._index, stop, "left"))
+        values = np.cumsum(varint_decode(self._data[self._offsets[first]: self._offsets[last]]))
+        if last - first > 1:
+            '''every row is summed from its own first neighbor'''
+            row_starts = self._index[first: last] - self._index[first]
+            values -= np.repeat(np.concatenate(([0], values))[row_starts], np.diff(self._index[first: last + 1]))
+        return values[start - self._index[first]: stop - self._index[first]]
+
+    def tolist(self):
+        return self[:].tolist()
+
+
+# the node names saved by encode_labels, as a list (or a LabelTable if lazy and they are strings)
+def decode_labels(kind, arrays, prefix="", lazy=False):
+    if kind == "int":
+        return arrays[prefix + "labels"].tolist()
+    table = LabelTable(arrays[prefix + "labels_data"], arrays[prefix + "labels_offsets"])
+    return table if lazy else table.tolist()
+
+
+# split a list (or np array) of edges [[5,1,0.1],[2,3,3]] to its sources, targets and weights
+def edges_columns(graph, weighted=True):
+    if isinstance(graph, np.ndarray):
+        return graph[:, 0], graph[:, 1], graph[:, 2].astype(float) if weighted else None
+    sources = [edge[0] for edge in graph]
+    targets = [edge[1] for edge in graph]
+    weights = [float(edge[2]) for edge in graph] if weighted else None
+    return sources, targets, weights
+
+
+# the length of str of every number
+def _str_lengths(numbers):
+    return np.searchsorted(POWERS_OF_TEN, np.abs(numbers), side="right") + 1 + (numbers < 0)
+
+
+# the lengths of the first two fields of every non-empty line in block (an array of the bytes of whole lines)
+def _fields_lengths(block):
+    ends = np.flatnonzero(block == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    '''a "\r" before the newline is not a part of the last field'''
+    ends = ends - ((block[np.maximum(ends - 1, 0)] == ord("\r")) & (ends > starts))
+    non_empty = ends > starts
+    starts, ends = starts[non_empty], ends[non_empty]
+    commas = np.append(np.flatnonzero(block == ord(",")), len(block))
+    first = np.minimum(commas[np.searchsorted(commas, starts)], ends)
+    second = np.minimum(commas[np.searchsorted(commas, first + 1)], ends)
+    return first - starts, second - first - 1
+
+
+# whether the integer ids read from a csv file are written in it exactly as str writes them, so that reading them as
+# integers names the nodes by their text and doesn't merge different ids (like "1" and "01"). Any other text of a
+# number ("01", "+1", " 1", "-0", quoted) is longer than str of it, so comparing lengths is enough.
+def _written_as_str(file_name, header, sources, targets, block_bytes=CSV_BLOCK_BYTES):
+    sources_lengths, targets_lengths = [], []
+    with open(file_name, "rb") as f:
+        if header:
+            f.readline()
+        while True:
+            block = f.read(block_bytes)
+            if not block:
+                break
+            block += f.readline()
+            if not block.endswith(b"\n"):
+                block += b"\n"
+            lengths = _fields_lengths(np.frombuffer(block, dtype=np.uint8))
+            sources_lengths.append(lengths[0])
+            targets_lengths.append(lengths[1])
+    sources_lengths = np.concatenate(sources_lengths) if sources_lengths else np.zeros(0, dtype=np.int64)
+    targets_lengths = np.concatenate(targets_lengths) if targets_lengths else np.zeros(0, dtype=np.int64)
+    return len(sources_lengths) == len(sources) and (sources_lengths == _str_lengths(sources)).all() and \
+        (targets_lengths == _str_lengths(targets)).all()
+
+
+# read a csv file of edges (source, target, weight) into three arrays, chunk by chunk.
+# node ids are read as integers if all of them are integers written as str writes them (so str of the ids is their
+# text), or as strings otherwise.
+def read_edges_csv(file_name, header=True, weighted=True, chunksize=CSV_CHUNKSIZE):
+    columns = [0, 1, 2] if weighted else [0, 1]
+    for ids_dtype in (np.int64, str):
+        dtypes = {0: ids_dtype, 1: ids_dtype, 2: np.float64}
+        sources, targets, weights = [], [], []
+        try:
+            reader = pd.read_csv(file_name, header=None, skiprows=1 if header else 0, usecols=columns,
+                                 dtype={column: dtypes[column] for column in columns}, float_precision="round_trip",
+                                 chunksize=chunksize)
+            for chunk in reader:
+                sources.append(chunk[0].to_numpy())
+                targets.append(chunk[1].to_numpy())
+                if weighted:
+                    weights.append(chunk[2].to_numpy())
+        except pd.errors.EmptyDataError:
+            break
+        except (ValueError, OverflowError):
+            if ids_dtype is str:
+                raise
+            continue
+        if sources:
+            sources, targets = np.concatenate(sources), np.concatenate(targets)
+            if ids_dtype is str or _written_as_str(file_name, header, sources, targets):
+                return sources, targets, np.concatenate(weights) if weighted else None
+            continue
+        break
+    empty = np.zeros(0, dtype=np.int64)
+    return empty, empty, np.zeros(0) if weighted else None
+
+
+class IdentityNodeMap(Mapping):
+    """
+    The node to number map of an interned graph, where the nodes are the numbers 0, 1, ..., size - 1.
+    It keeps no per-node objects, and can replace both OrderedDicts of LolGraph.
+    """
+    def __init__(self, size=0):
+        self._size = size
+
+    def __getitem__(self, node):
+        try:
+            number = operator.index(node)
+        except TypeError:
+            raise KeyError(node)
+        if not 0 <= number < self._size:
+            raise KeyError(node)
+        return number
+
+    def __iter__(self):
+        return iter(range(self._size))
+
+    def __len__(self):
+        return self._size
+
+    def copy(self):
+        return IdentityNodeMap(self._size)
+
+    # new nodes must be numbered consecutively after the existing ones, raises a ValueError (before anything is
+    # changed) if the nodes (in order) are not size, size + 1, ...
+    def check_new_nodes(self, nodes):
+        for expected, node in enumerate(nodes, self._size):
+            try:
+                is_expected = operator.index(node) == expected
+            except TypeError:
+                is_expected = False
+            if not is_expected:
+                raise ValueError(f"Interned graphs number new nodes consecutively, expected {expected} got {node}")
+
+    def update(self, other):
+        other = dict(other)
+        self.check_new_nodes(other)
+        if list(other.values()) != list(other):
+            raise ValueError("Interned graphs map every node to itself")
+        self._size += len(other)
+
+
+class AdjacencyView(Mapping):
+    """
+    A read only {node: {neighbor: {'weight': weight}}} view of a LolGraph, like the dict of graph_adjacency used to
+    be. The neighbors of a node are read from the graph lists only when they are asked for, nothing is copied.
+    """
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __getitem__(self, node):
+        return NeighborsView(self._graph, self._graph._map_node_to_number[node])
+
+    def __iter__(self):
+        return iter(self._graph._map_node_to_number)
+
+    def __len__(self):
+        return self._graph.number_of_nodes()
+
+    def __contains__(self, node):
+        return node in self._graph._map_node_to_number
+
+
+class NeighborsView(Mapping):
+    """
+    A read only {neighbor: {'weight': weight}} view of the row of one node in a LolGraph.
+    Getting one neighbor is a binary search in the row, iterating goes over the row in order.
+    """
+    def __init__(self, graph, number):
+        self._graph = graph
+        self._number = number
+
+    # the neighbors numbers and weights of the row (weights are 1 if the graph is not weighted), as python lists
+    def _row(self):
+        neighbors_list, weights_list = self._graph._row(self._number)
+        if weights_list is None:
+            weights_list = [1] * len(neighbors_list)
+        if self._graph.storage != "list":
+            return neighbors_list.tolist(), weights_list if isinstance(weights_list, list) else weights_list.tolist()
+        return neighbors_list, weights_list
+
+    def __getitem__(self, neighbor):
+        try:
+            weight = self._graph._entry_weight(self._number, self._graph._map_node_to_number[neighbor])
+        except KeyError:
+            raise KeyError(neighbor)
+        if weight is None:
+            raise KeyError(neighbor)
+        if self._graph.is_weighted():
+            return {'weight': float(weight)}
+        return {'weight': 1}
+
+    def __iter__(self):
+        map_number_to_node = self._graph._map_number_to_node
+        return (map_number_to_node[neighbor] for neighbor in self._row()[0])
+
+    def __len__(self):
+        if self._number in self._graph._delta:
+            return len(self._graph._row(self._number)[0])
+        return int(self._graph._index_list[self._number + 1] - self._graph._index_list[self._number])
+
+    def items(self):
+        return NeighborsItemsView(self)
+
+
+class NeighborsItemsView(ItemsView):
+    # go over the row once instead of searching every neighbor again
+    def __iter__(self):
+        map_number_to_node = self._mapping._graph._map_number_to_node
+        for neighbor, weight in zip(*self._mapping._row()):
+            yield map_number_to_node[neighbor], {'weight': weight}
 
 
 class LolGraph:
 
-    def __init__(self, directed=True, weighted=True):
-        self._index_list = [0]
-        self._neighbors_list = []
-        self._weights_list = []
-        self._map_node_to_number = OrderedDict()
-        self._map_number_to_node = OrderedDict()
+    # interned graphs name their nodes 0, 1, ..., n-1 and keep the original names in one list (self._labels),
+    # to be used when reading and writing files.
+    def __init__(self, directed=True, weighted=True, storage="list", dtypes=None, interned=False):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {STORAGE_MODES}")
+        self.storage = storage
+        self.dtypes = dict(DEFAULT_DTYPES, **(dtypes or {}))
+        self.interned = interned
+        self._index_list = self._to_storage([0], "index")
+        self._neighbors_list = self._to_storage([], "neighbors")
+        self._weights_list = self._to_storage([], "weights")
+        self._map_node_to_number = IdentityNodeMap() if interned else OrderedDict()
+        self._map_number_to_node = IdentityNodeMap() if interned else OrderedDict()
+        self._labels = []
+        self._label_to_node = None
         self.directed = directed
         self.weighted = weighted
+        '''weighted degrees by node number and the total weight, computed with the lists (see _compute_degrees)'''
+        self._out_degrees = None
+        self._in_degrees = None
+        self._size = None
+        '''changes to the lists not merged yet: {source number: {target number: weight, or None if removed}}'''
+        self._delta = {}
+        self._delta_size = 0
+        self._pending_entries = 0
+        '''parts ("index", "degrees", "nodes", "delta") still shared with copies of the graph, see copy and _own'''
+        self._shared = set()
+        '''after permute_nodes, node_permutation[i] is the number the node numbered i had when the graph was built'''
+        self.node_permutation = None
 
     def is_directed(self):
         return self.directed
@@ -24,33 +708,131 @@ class LolGraph:
 
     def number_of_edges(self):
         if self.is_directed():
-            return len(self._neighbors_list)
-        return len(self._neighbors_list) / 2
+            return len(self._neighbors_list) + self._pending_entries
+        return (len(self._neighbors_list) + self._pending_entries) / 2
 
     def number_of_nodes(self):
         return len(self._index_list) - 1
 
+    # convert a python list to the storage of this graph, kind is one of "index", "neighbors" or "weights"
+    # (with "compressed" storage the neighbors are numpy arrays too, _apply_storage compresses the neighbors list)
+    def _to_storage(self, values, kind):
+        if self.storage != "list":
+            return np.asarray(values, dtype=self.dtypes[kind])
+        if isinstance(values, np.ndarray):
+            return values.tolist()
+        return values if isinstance(values, list) else list(values)
+
+    # move the three lists into the configured storage
+    def _apply_storage(self):
+        self._index_list = self._to_storage(self._index_list, "index")
+        if self.storage != "compressed":
+            self._neighbors_list = self._to_storage(self._neighbors_list, "neighbors")
+        elif not isinstance(self._neighbors_list, CompressedNeighbors):
+            self._neighbors_list = CompressedNeighbors(self._index_list, self._neighbors_list)
+        self._weights_list = self._to_storage(self._weights_list, "weights")
+
+    # the three lists as python lists, whatever the storage is
+    def _as_lists(self):
+        if self.storage != "list":
+            return self._index_list.tolist(), self._neighbors_list.tolist(), self._weights_list.tolist()
+        return self._index_list, self._neighbors_list, self._weights_list
+
+    # a copy that shares the lists, degrees, node maps, names and delta of this graph (copy on write).
+    # The graphs only change these in place through _own, which copies a shared part first, so copying is O(1).
     def copy(self):
-        new_lol_graph = LolGraph()
-        new_lol_graph._index_list = self._index_list.copy()
-        new_lol_graph._neighbors_list = self._neighbors_list.copy()
-        new_lol_graph._weights_list = self._weights_list.copy()
-        new_lol_graph._map_node_to_number = self._map_node_to_number.copy()
-        new_lol_graph._map_number_to_node = self._map_number_to_node.copy()
-        new_lol_graph.directed = self.directed
-        new_lol_graph.weighted = self.weighted
+        new_lol_graph = LolGraph(directed=self.directed, weighted=self.weighted, storage=self.storage,
+                                 dtypes=self.dtypes, interned=self.interned)
+        new_lol_graph._labels = self._labels
+        new_lol_graph._label_to_node = self._label_to_node
+        new_lol_graph._index_list = self._index_list
+        new_lol_graph._neighbors_list = self._neighbors_list
+        new_lol_graph._weights_list = self._weights_list
+        new_lol_graph._map_node_to_number = self._map_node_to_number
+        new_lol_graph._map_number_to_node = self._map_number_to_node
+        new_lol_graph._out_degrees = self._out_degrees
+        new_lol_graph._in_degrees = self._in_degrees
+        new_lol_graph._size = self._size
+        new_lol_graph._delta = self._delta
+        new_lol_graph._delta_size = self._delta_size
+        new_lol_graph._pending_entries = self._pending_entries
+        new_lol_graph.node_permutation = self.node_permutation
+        self._shared.update(COPY_ON_WRITE_PARTS)
+        new_lol_graph._shared = set(COPY_ON_WRITE_PARTS)
+        if hasattr(self, "_shared_memory"):
+            new_lol_graph._shared_memory = self._shared_memory
         return new_lol_graph
 
+    # copy a part of the graph that is shared with copies of it, before changing it in place
+    def _own(self, part):
+        if part not in self._shared:
+            return
+        self._shared.discard(part)
+        if part == "index":
+            self._index_list = self._index_list.copy()
+        elif part == "degrees" and self._out_degrees is not None:
+            self._out_degrees = self._out_degrees.copy()
+            self._in_degrees = self._in_degrees.copy()
+        elif part == "nodes":
+            self._map_node_to_number = self._map_node_to_number.copy()
+            self._map_number_to_node = self._map_number_to_node.copy()
+        elif part == "delta":
+            self._delta = {number: changes.copy() for number, changes in self._delta.items()}
+
+    # compute the weighted out and in degrees of all the nodes and the size of the graph from the lists.
+    # called once when the graph is built (and after compact), the changes of the graph keep them up to date.
+    def _compute_degrees(self):
+        sources, targets, weights = self._edge_numbers()
+        self._shared.discard("degrees")
+        self._out_degrees, self._in_degrees, self._size = _edges_totals(sources, targets, weights,
+                                                                        self.number_of_nodes(), self.directed)
+
+    # every edge of the graph as the numbers of its source and target and its weight (None if the graph is not
+    # weighted), as numpy arrays in the lists order. The delta is merged into the lists first.
+    def _edge_numbers(self):
+        self.compact()
+        return self._stored_edge_numbers()
+
+    # every position of the lists as an edge, like _edge_numbers but without the changes in the delta
+    def _stored_edge_numbers(self):
+        index_list = np.asarray(self._index_list, dtype=np.int64)
+        sources = np.repeat(np.arange(len(index_list) - 1), np.diff(index_list))
+        targets = np.asarray(self._neighbors_list[:index_list[-1]], dtype=np.int64)
+        weights = np.asarray(self._weights_list[:index_list[-1]], dtype=np.float64) if self.is_weighted() else None
+        return sources, targets, weights
+
+    # all the nodes by their numbers in a numpy array of objects, so every node keeps its type
+    def _nodes_array(self):
+        if self.interned:
+            return np.arange(self.number_of_nodes())
+        nodes = np.empty(self.number_of_nodes(), dtype=object)
+        for number, node in self._map_number_to_node.items():
+            nodes[number] = node
+        return nodes
+
     # outdegree
     def out_degree(self, node):
-        number = self._map_node_to_number[node]
-        idx = self._index_list[number]
-        idx_end = self._index_list[number + 1]
-        if self.is_weighted():
-            weights_list = self._weights_list[idx: idx_end]
-            return sum(weights_list)
-        else:
-            return idx_end - idx
+        if self._out_degrees is None:
+            self._compute_degrees()
+        return self._out_degrees[self._map_node_to_number[node]].item()
+
+    # indegree
+    def in_degree(self, node):
+        if self._in_degrees is None:
+            self._compute_degrees()
+        return self._in_degrees[self._map_node_to_number[node]].item()
+
+    # the out degree of every node, ordered by the nodes numbers (like nodes()), as a read only array
+    def out_degrees(self):
+        if self._out_degrees is None:
+            self._compute_degrees()
+        return _read_only(self._out_degrees)
+
+    # the in degree of every node, ordered by the nodes numbers (like nodes()), as a read only array
+    def in_degrees(self):
+        if self._in_degrees is None:
+            self._compute_degrees()
+        return _read_only(self._in_degrees)
 
     # Iterative Binary Search Function
     # It returns index of x in given array arr if present,
@@ -87,22 +869,6 @@ class LolGraph:
             return arr.index(x)
         return -1
 
-    # # indegree
-    # def in_degree(self, node):
-    #     sum = 0
-    #     for node_from in self.nodes():
-    #         if self.is_weighted():
-    #             neighbors_list, weights_list = self.neighbors(node_from)
-    #         else:
-    #             neighbors_list = self.neighbors(node_from)
-    #         x = self.nodes_binary_search(neighbors_list, node)
-    #         if x != -1:
-    #             if self.is_weighted():
-    #                 sum += weights_list[x]
-    #             else:
-    #                 sum += 1
-    #     return sum
-    #
     # def predecessors(self, node):
     #     nodes_list = []
     #     for node_from in self.nodes():
@@ -113,332 +879,696 @@ class LolGraph:
     def nodes(self):
         return list(self._map_node_to_number.keys())
 
+    # the original name of a node (the node itself, if the graph is not interned)
+    def node_label(self, node):
+        if self.interned:
+            return self._labels[node]
+        return node
+
+    # the original names of all the nodes, by the nodes order
+    def node_labels(self):
+        if self.interned:
+            return self._labels
+        return list(self._map_number_to_node.values())
+
+    # the node with the given original name
+    def node_from_label(self, label):
+        if not self.interned:
+            return label
+        if self._label_to_node is None:
+            self._label_to_node = {node_label: node for node, node_label in enumerate(self._labels)}
+        return self._label_to_node[label]
+
     def edges(self):
         return self.convert_back()
 
+    # the edges one by one as (node, to_node, weight) tuples ((node, to_node) if the graph is not weighted),
+    # in the order of convert_back, without building the whole list
+    def iter_edges(self):
+        for number, node in self._map_number_to_node.items():
+            neighbors_list, weights_list = self._row(number)
+            if self.storage != "list":
+                neighbors_list = neighbors_list.tolist()
+                weights_list = weights_list.tolist() if self.is_weighted() else None
+            for i, neighbor in enumerate(neighbors_list):
+                to_node = self._map_number_to_node[neighbor]
+                if not self.is_directed() and to_node < node:
+                    continue
+                if self.is_weighted():
+                    yield node, to_node, weights_list[i]
+                else:
+                    yield node, to_node
+
+    # the edges as three numpy arrays: sources, targets and weights (None if the graph is not weighted), in the
+    # order of convert_back. With numbers=True the sources and targets are the nodes numbers instead of the nodes.
+    def edge_arrays(self, numbers=False):
+        sources, targets, weights = self._edge_numbers()
+        if not numbers or not self.is_directed():
+            nodes = self._nodes_array()
+        if not self.is_directed():
+            '''every undirected edge once, from the smaller node (or number, if the nodes can't be compared)'''
+            try:
+                keep = ~(nodes[targets] < nodes[sources])
+            except TypeError:
+                keep = targets >= sources
+            sources, targets = sources[keep], targets[keep]
+            weights = weights[keep] if self.is_weighted() else None
+        if numbers:
+            return sources, targets, weights
+        return nodes[sources], nodes[targets], weights
+
     def is_edge_between_nodes(self, node1, node2):
-        number = self._map_node_to_number[node1]
+        return self._entry_weight(self._map_node_to_number[node1], self._map_node_to_number[node2]) is not None
+
+    # the position of the edge node1 -> node2 in the neighbors and weights lists, or -1 if there is no such edge.
+    # positions are only meaningful without a delta, so it is merged into the lists first.
+    def edge_position(self, node1, node2):
+        self.compact()
+        return self._edge_position(self._map_node_to_number[node1], self._map_node_to_number[node2])
+
+    # the weight of the entry number1 -> number2 of the lists (1 if the graph is not weighted) after the changes in
+    # the delta, or None if there is no such entry
+    def _entry_weight(self, number1, number2):
+        changes = self._delta.get(number1)
+        if changes is not None and number2 in changes:
+            return changes[number2]
+        position = self._edge_position(number1, number2)
+        if position == -1:
+            return None
+        return self._weights_list[position] if self.is_weighted() else 1
+
+    # the neighbors numbers and weights (None if the graph is not weighted) of the row of a node, in the storage of
+    # the graph. Without changes in the delta these are slices of the lists, otherwise the row is merged with them.
+    def _row(self, number):
         idx = self._index_list[number]
         idx_end = self._index_list[number + 1]
-        return self._map_node_to_number[node2] in self._neighbors_list[idx: idx_end]
-        # for neighbor in self._neighbors_list[idx: idx_end]:
-        #     if node2 == self._map_number_to_node[neighbor]:
-        #         return True
-        # return False
+        neighbors_list = self._neighbors_list[idx: idx_end]
+        weights_list = self._weights_list[idx: idx_end] if self.is_weighted() else None
+        changes = self._delta.get(number)
+        if not changes:
+            return neighbors_list, weights_list
+        if self.storage != "list":
+            neighbors_list = neighbors_list.tolist()
+            weights_list = weights_list.tolist() if self.is_weighted() else None
+        row = dict(zip(neighbors_list, weights_list if self.is_weighted() else [1] * len(neighbors_list)))
+        row.update(changes)
+        neighbors_list = sorted(neighbor for neighbor, weight in row.items() if weight is not None)
+        if self.is_weighted():
+            weights_list = self._to_storage([row[neighbor] for neighbor in neighbors_list], "weights")
+        return self._to_storage(neighbors_list, "neighbors"), weights_list
 
+    # binary search of number2 in the (sorted) row of number1, directly on the lists without slicing them
+    def _edge_position(self, number1, number2):
+        idx = self._index_list[number1]
+        idx_end = self._index_list[number1 + 1]
+        if self.storage != "list":
+            row = self._neighbors_list[idx: idx_end]
+            offset = np.searchsorted(row, number2)
+            if offset < len(row) and row[offset] == number2:
+                return int(idx + offset)
+            return -1
+        position = bisect_left(self._neighbors_list, number2, idx, idx_end)
+        if position < idx_end and self._neighbors_list[position] == number2:
+            return int(position)
+        return -1
+
+    # the positions of many edges numbers1[i] -> numbers2[i] at once (-1 for missing edges).
+    # all the binary searches advance together, so there are only log(max degree) numpy steps.
+    def _edge_positions(self, numbers1, numbers2):
+        numbers2 = np.asarray(numbers2)
+        index_list = np.asarray(self._index_list)
+        low = index_list[numbers1].astype(np.int64)
+        high = index_list[np.asarray(numbers1) + 1].astype(np.int64)
+        row_end = high.copy()
+        if len(self._neighbors_list) == 0:
+            return np.full(len(low), -1, dtype=np.int64)
+        last = len(self._neighbors_list) - 1
+        searching = low < high
+        while searching.any():
+            middle = (low + high) // 2
+            go_right = searching & (self._neighbors_list[np.minimum(middle, last)] < numbers2)
+            low = np.where(go_right, middle + 1, low)
+            high = np.where(searching & ~go_right, middle, high)
+            searching = low < high
+        found = (low < row_end) & (self._neighbors_list[np.minimum(low, last)] == numbers2)
+        return np.where(found, low, -1)
+
+    # the total weight of the edges (number of edges if the graph is not weighted). In an undirected graph, as
+    # before the degrees were kept: a weighted edge counts half of its weight (self loops all of it), and the number
+    # of edges is half the length of the lists.
     def size(self):
-        if self.is_weighted() and not self.is_directed():
-            edges = self.edges()
-            size = 0
-            for edge in edges:
-                if edge[0] == edge[1]:
-                    size += edge[2]
-                else:
-                    size += edge[2] / 2
-            return size
-        if self.is_weighted():
-            return sum(self._weights_list)
-        if not self.is_directed():
-            return len(self._neighbors_list) / 2
-        return len(self._neighbors_list)
+        if self._size is None:
+            self._compute_degrees()
+        return self._size
 
     def get_edge_data(self, node1, node2, default=None):
-        number = self._map_node_to_number[node1]
-        idx = self._index_list[number]
-        idx_end = self._index_list[number + 1]
-        node1_neighbors = self._neighbors_list[idx: idx_end]
-        node2_index = self.binary_search(node1_neighbors, self._map_node_to_number[node2])
-        if node2_index == -1:
+        weight = self._entry_weight(self._map_node_to_number[node1], self._map_node_to_number[node2])
+        if weight is None:
             return default
         if self.is_weighted():
-            return {"weight": self._weights_list[idx + node2_index]}
+            return {"weight": float(weight)}
         return {}
 
+    # the weights of the edges of many (node1, node2) pairs, as a numpy array.
+    # missing edges get the default, and edges of an unweighted graph get 1.
+    def get_edge_data_many(self, pairs, default=np.nan):
+        if self.interned:
+            numbers = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        else:
+            numbers = np.array([(self._map_node_to_number[node1], self._map_node_to_number[node2])
+                                for node1, node2 in pairs], dtype=np.int64).reshape(-1, 2)
+        if self.storage == "numpy" and len(numbers) >= VECTORIZED_LOOKUP_MIN:
+            positions = self._edge_positions(numbers[:, 0], numbers[:, 1])
+        else:
+            positions = np.array([self._edge_position(number1, number2) for number1, number2 in numbers.tolist()],
+                                 dtype=np.int64)
+        weights = np.full(len(positions), default, dtype=float)
+        found = positions != -1
+        if not self.is_weighted():
+            weights[found] = 1.
+        elif self.storage != "list":
+            weights[found] = self._weights_list[positions[found]]
+        else:
+            weights[found] = [self._weights_list[position] for position in positions[found].tolist()]
+        if self._delta:
+            for i, (number1, number2) in enumerate(numbers.tolist()):
+                changes = self._delta.get(number1)
+                if changes is not None and number2 in changes:
+                    weights[i] = default if changes[number2] is None else changes[number2]
+        return weights
+
     # input: csv file containing edges list, in the form of [[5,1],[2,3],[5,3],[4,5]]
-    def convert_with_csv(self, files_name, header=True):
-        self._map_node_to_number = OrderedDict()
-        graph = []
-        for i in range(len(files_name)):
-            file = files_name[i]
-            with open(file, "r") as csvfile:
-                datareader = csv.reader(csvfile)
-                if header:
-                    next(datareader, None)  # skip the headers
-                for edge in datareader:
-                    edge[2] = float(edge[2])
-                    graph.append(edge)
-                csvfile.close()
-        self.convert(graph)
+    # cutoff and top_k sparsify the graph as it is built, see sparsify.
+    def convert_with_csv(self, files_name, header=True, cutoff=None, top_k=None, reorder=None):
+        sources, targets, weights = zip(*[read_edges_csv(file, header, self.is_weighted()) for file in files_name])
+        is_integer = all(np.issubdtype(ids.dtype, np.integer) for ids in sources + targets)
+        if not is_integer:
+            '''some files have string ids, so all the ids are named by their text, which is str of the integer ids'''
+            sources, targets = [[ids.astype(str).astype(object) if np.issubdtype(ids.dtype, np.integer) else ids
+                                 for ids in files_ids] for files_ids in (sources, targets)]
+        self.convert_from_arrays(np.concatenate(sources), np.concatenate(targets),
+                                 np.concatenate(weights) if self.is_weighted() else None, cutoff=cutoff, top_k=top_k,
+                                 reorder=reorder)
+        '''the nodes are named by the text of the file, like csv.reader would read them'''
+        if is_integer:
+            self.relabel_nodes(str)
 
     # input: np array of edges, in the form of np array [[5,1,0.1],[2,3,3],[5,3,0.2],[4,5,9]]
-    def convert(self, graph):
-        free = 0
-        '''create dictionary to self._map_node_to_number from edges to our new numbering'''
-
-        for edge in graph:
-            if self._map_node_to_number.get(edge[0], None) is None:
-                self._map_node_to_number[edge[0]] = free
-                free += 1
-            if self._map_node_to_number.get(edge[1], None) is None:
-                self._map_node_to_number[edge[1]] = free
-                free += 1
-
-        '''create the opposite dictionary'''
-        self._map_number_to_node = OrderedDict((y, x) for x, y in self._map_node_to_number.items())
-
-        d = OrderedDict()
-        '''starting to create the index list. Unordered is important'''
-        for idx, edge in enumerate(graph):
-            d[self._map_node_to_number[edge[0]]] = d.get(self._map_node_to_number[edge[0]], 0) + 1
-            if not self.is_directed():
-                if edge[0] != edge[1]:
-                    d[self._map_node_to_number[edge[1]]] = d.get(self._map_node_to_number[edge[1]], 0) + 1
-            elif self._map_node_to_number[edge[1]] not in d.keys():
-                d[self._map_node_to_number[edge[1]]] = 0
-
-        '''transfer the dictionary to list'''
-        for j in range(1, len(d.keys()) + 1):
-            self._index_list.append(self._index_list[j - 1] + d.get(j - 1, 0))
-
-        '''create the second list'''
-        if self.is_directed():
-            self._neighbors_list = [-1] * len(graph)
-            if self.is_weighted():
-                self._weights_list = [0] * len(graph)
+    def convert(self, graph, cutoff=None, top_k=None, reorder=None):
+        self.convert_from_arrays(*edges_columns(graph, self.is_weighted()), cutoff=cutoff, top_k=top_k,
+                                 reorder=reorder)
+
+    # input: the sources, targets and (for weighted graphs) weights of the edges, as arrays of the same length.
+    # The nodes are numbered by order of first appearance, like in convert, unless nodes (every node of the graph,
+    # once) is given, and then nodes[i] is numbered i.
+    # With cutoff and/or top_k only the edges sparsify would keep are put in the lists, the nodes of the other edges
+    # are still in the graph. With reorder (one of NODE_ORDERS) the nodes are then numbered again, see reorder_nodes.
+    def convert_from_arrays(self, sources, targets, weights=None, nodes=None, cutoff=None, top_k=None,
+                            reorder=None):
+        if (cutoff is not None or top_k is not None) and not self.is_weighted():
+            raise ValueError("Only weighted graphs can be sparsified")
+        sources = _ids_array(sources)
+        targets = _ids_array(targets)
+        if sources.dtype.kind != targets.dtype.kind:
+            '''numpy would cast the ids of one side to the type of the other (like 1 to '1'), keep them as they are'''
+            sources, targets = sources.astype(object), targets.astype(object)
+        if len(sources) != len(targets) or (self.is_weighted() and len(weights) != len(sources)):
+            raise ValueError("sources, targets and weights must have the same length")
+
+        '''number the nodes once, going over the edges in order (source before target)'''
+        if nodes is None:
+            numbers, nodes = _factorize(np.stack((sources, targets), axis=1).reshape(-1))
+            nodes = nodes.tolist()
+            left, right = numbers[0::2], numbers[1::2]
         else:
-            self._neighbors_list = [-1] * len(graph) * 2
-            if self.weighted:
-                self._weights_list = [0] * len(graph) * 2
-
-        space = OrderedDict((x, -1) for x in self._map_number_to_node.keys())
-        for idx, edge in enumerate(graph):
-            left = self._map_node_to_number[edge[0]]
-            right = self._map_node_to_number[edge[1]]
+            left, right = _lookup(nodes, sources), _lookup(nodes, targets)
+        if self.is_weighted():
+            weights = np.asarray(weights, dtype=self.dtypes["weights"])
+
+        '''in an undirected graph every edge is in the lists of both of its nodes (self loops only once)'''
+        if not self.is_directed():
+            not_loop = left != right
+            left, right = np.concatenate((left, right[not_loop])), np.concatenate((right, left[not_loop]))
             if self.is_weighted():
-                weight = float(edge[2])
+                weights = np.concatenate((weights, weights[not_loop]))
 
-            if space[left] != -1:
-                space[left] += 1
-                i = space[left]
-            else:
-                i = self._index_list[left]
-                space[left] = i
-            self._neighbors_list[i] = right
-            if self.weighted:
-                self._weights_list[i] = weight
-
-            if not self.is_directed() and left != right:
-                if space[right] != -1:
-                    space[right] += 1
-                    i = space[right]
-                else:
-                    i = self._index_list[right]
-                    space[right] = i
-                self._neighbors_list[i] = left
-                if self.is_weighted():
-                    self._weights_list[i] = weight
-        self._neighbors_list, self._weights_list = self.sort_all(index_list=self._index_list,
-                                                                 neighbors_list=self._neighbors_list,
-                                                                 weights_list=self._weights_list)
+        if cutoff is not None or top_k is not None:
+            keep = _sparsify_mask(left, right, weights, cutoff, top_k, self.is_directed())
+            left, right, weights = left[keep], right[keep], weights[keep]
 
-    # convert back to [[5,1,0.1],[2,3,3],[5,3,0.2],[4,5,9]] format using self dicts
-    def convert_back(self):
-        graph = []
-        for number in range(len(self._index_list) - 1):
-            node = self._map_number_to_node[number]
-            index = self._index_list[number]
-            while index < self._index_list[number + 1]:
-                to_node = self._map_number_to_node[self._neighbors_list[index]]
-                if not self.is_directed() and to_node < node:
-                    index += 1
-                    continue
-                if self.is_weighted():
-                    weight = self._weights_list[index]
-                    edge = [node, to_node, weight]
-                else:
-                    edge = [node, to_node]
-                graph.append(edge)
-                index += 1
+        '''count the edges of every node for the index list, and sort all the rows at once'''
+        index_list = np.zeros(len(nodes) + 1, dtype=self.dtypes["index"])
+        np.cumsum(np.bincount(left, minlength=len(nodes)), out=index_list[1:])
+        order = np.lexsort((right, left))
+
+        self._index_list = index_list
+        self._neighbors_list = right[order]
+        self._weights_list = weights[order] if self.is_weighted() else []
+        self._clear_delta()
+        self.node_permutation = None
+        self._set_node_labels(nodes if isinstance(nodes, list) else np.asarray(nodes).tolist())
+        self._apply_storage()
+        self._compute_degrees()
+        if reorder is not None:
+            self.reorder_nodes(reorder)
+
+    # keep only the edges heavier than cutoff and/or the top_k heaviest out edges of every node (in an undirected
+    # graph, an edge is kept if one of its nodes keeps it). The nodes are all kept, like in the networkx loader.
+    # Of edges with the same weight, the ones to the targets numbered first when the graph was built are kept.
+    def sparsify(self, cutoff=None, top_k=None):
+        if not self.is_weighted():
+            raise ValueError("Only weighted graphs can be sparsified")
+        if cutoff is None and top_k is None:
+            return
+        sources, targets, weights = self._edge_numbers()
+        '''ties are broken by the numbers of the nodes as built, as when sparsifying the build, also after reorder'''
+        target_numbers = None if self.node_permutation is None else self.node_permutation[targets]
+        keep = _sparsify_mask(sources, targets, weights, cutoff, top_k, self.is_directed(), target_numbers)
+        '''the kept entries stay in the lists order, so the rows stay sorted'''
+        self._index_list = np.zeros(self.number_of_nodes() + 1, dtype=self.dtypes["index"])
+        np.cumsum(np.bincount(sources[keep], minlength=self.number_of_nodes()), out=self._index_list[1:])
+        self._neighbors_list = targets[keep]
+        self._weights_list = weights[keep]
+        self._apply_storage()
+        self._compute_degrees()
+
+    # number the nodes again: the node numbered order[i] is numbered i. The rows are moved and sorted again with
+    # the new numbers, and in an interned graph the nodes themselves change (their names move with them).
+    # node_permutation keeps the numbers the nodes had when the graph was built, to map results back.
+    def permute_nodes(self, order):
+        order = np.asarray(order, dtype=np.int64)
+        nodes_amount = self.number_of_nodes()
+        if len(order) != nodes_amount or (np.bincount(order, minlength=nodes_amount) != 1).any():
+            raise ValueError("order must hold every node number once")
+        sources, targets, weights = self._edge_numbers()
+        new_numbers = np.empty(nodes_amount, dtype=np.int64)
+        new_numbers[order] = np.arange(nodes_amount)
+        sources, targets = new_numbers[sources], new_numbers[targets]
+        edges_order = np.lexsort((targets, sources))
+        self._index_list = np.zeros(nodes_amount + 1, dtype=self.dtypes["index"])
+        np.cumsum(np.bincount(sources, minlength=nodes_amount), out=self._index_list[1:])
+        self._neighbors_list = targets[edges_order]
+        self._weights_list = weights[edges_order] if self.is_weighted() else []
+        labels = self.node_labels()
+        self._set_node_labels([labels[number] for number in order.tolist()])
+        self.node_permutation = order if self.node_permutation is None else self.node_permutation[order]
+        self._apply_storage()
+        self._compute_degrees()
+
+    # an order of the node numbers by one of NODE_ORDERS, for permute_nodes (see _locality_order)
+    def locality_order(self, method="rcm"):
+        sources, targets, _ = self._edge_numbers()
+        return _locality_order(sources, targets, self.number_of_nodes(), method, self.is_directed())
+
+    # number the nodes by one of NODE_ORDERS, so the rows and the per node arrays that are read together (the
+    # neighbors of a node, a BFS front) are close in memory. The order used is added to node_permutation.
+    def reorder_nodes(self, method="rcm"):
+        self.permute_nodes(self.locality_order(method))
+
+    # the graph of some of the nodes and the edges between them, as a new graph. The nodes keep their order, so in an
+    # interned graph they are numbered again from 0 (node_label still gives their original names).
+    def subgraph(self, nodes):
+        keep_nodes = np.zeros(self.number_of_nodes(), dtype=bool)
+        keep_nodes[self._number_nodes(nodes)] = True
+        sources, targets, weights = self._edge_numbers()
+        keep = keep_nodes[sources] & keep_nodes[targets]
+        return self._kept_graph(keep_nodes, sources[keep], targets[keep], weights[keep] if self.is_weighted() else None)
+
+    # a new graph of the nodes where keep_nodes is True (in the same order) with the given edges between them:
+    # node numbers of this graph and weights, in the lists order
+    def _kept_graph(self, keep_nodes, sources, targets, weights):
+        new_numbers = np.cumsum(keep_nodes) - 1
+        nodes_amount = int(np.count_nonzero(keep_nodes))
+        graph = LolGraph(directed=self.directed, weighted=self.weighted, storage=self.storage, dtypes=self.dtypes,
+                         interned=self.interned)
+        graph._index_list = np.zeros(nodes_amount + 1, dtype=self.dtypes["index"])
+        np.cumsum(np.bincount(new_numbers[sources], minlength=nodes_amount), out=graph._index_list[1:])
+        graph._neighbors_list = new_numbers[targets]
+        graph._weights_list = weights if self.is_weighted() else []
+        labels = self.node_labels()
+        graph._set_node_labels([labels[number] for number in np.flatnonzero(keep_nodes).tolist()])
+        graph._apply_storage()
+        graph._compute_degrees()
         return graph
 
-    # sort the neighbors for each node
-    def sort_all(self, index_list=None, neighbors_list=None, weights_list=None):
-        for number in range(len(index_list) - 1):
-            start = index_list[number]
-            end = index_list[number + 1]
-            neighbors_list[start: end], weights_list[start: end] = self.sort_neighbors(neighbors_list[start: end], weights_list[start: end])
-        return neighbors_list, weights_list
+    # rename every node n to function(n). In an interned graph only the original names are changed.
+    def relabel_nodes(self, function):
+        self._set_node_labels([function(node) for node in self.node_labels()])
 
-    def sort_neighbors(self, neighbors_list=None, weights_list=None):
-        if self.weighted:
-            neighbors_weights = {neighbors_list[i]: weights_list[i] for i in range(len(neighbors_list))}
-            neighbors_weights = OrderedDict(sorted(neighbors_weights.items()))
-            return neighbors_weights.keys(), neighbors_weights.values()
-        else:
-            return sorted(neighbors_list), weights_list
+    # the node numbered i is nodes[i]
+    def _set_node_labels(self, nodes):
+        self._shared.discard("nodes")
+        if self.interned:
+            self._labels = nodes
+            self._label_to_node = None
+            self._map_number_to_node = IdentityNodeMap(len(nodes))
+            self._map_node_to_number = IdentityNodeMap(len(nodes))
+            return
+        self._map_number_to_node = OrderedDict(enumerate(nodes))
+        self._map_node_to_number = OrderedDict((node, number) for number, node in enumerate(nodes))
+
+    # use the nodes (maps and names) of another graph with the same numbering, without copying them.
+    # this graph copies them before adding nodes, the other graph changes them for both.
+    def _share_nodes(self, other):
+        self._map_node_to_number = other._map_node_to_number
+        self._map_number_to_node = other._map_number_to_node
+        self._shared.add("nodes")
+        self._labels = other._labels
+        self._label_to_node = other._label_to_node
+
+    # the graph with all the edges reversed (directed), computed from the lists of this graph:
+    # the edges are counted by target for the index list and placed with a stable sort by target, so every row
+    # stays sorted. The nodes keep their numbers, and the node maps are shared with this graph.
+    def transpose(self):
+        self.compact()
+        index_list = np.asarray(self._index_list, dtype=np.int64)
+        nodes_amount = len(index_list) - 1
+        neighbors_list = np.asarray(self._neighbors_list[:index_list[-1]], dtype=np.int64)
+        sources = np.repeat(np.arange(nodes_amount), np.diff(index_list))
+        order = np.argsort(neighbors_list, kind="stable")
+
+        reversed_lol = LolGraph(directed=True, weighted=self.weighted, storage=self.storage, dtypes=self.dtypes,
+                                interned=self.interned)
+        reversed_lol._index_list = np.zeros(nodes_amount + 1, dtype=np.int64)
+        np.cumsum(np.bincount(neighbors_list, minlength=nodes_amount), out=reversed_lol._index_list[1:])
+        reversed_lol._neighbors_list = sources[order]
+        if self.is_weighted():
+            reversed_lol._weights_list = np.asarray(self._weights_list[:index_list[-1]])[order]
+        reversed_lol._apply_storage()
+        reversed_lol._share_nodes(self)
+        reversed_lol._compute_degrees()
+        return reversed_lol
+
+    # convert back to [[5,1,0.1],[2,3,3],[5,3,0.2],[4,5,9]] format using self dicts
+    def convert_back(self):
+        sources, targets, weights = self.edge_arrays()
+        if self.is_weighted():
+            return list(map(list, zip(sources.tolist(), targets.tolist(), weights.tolist())))
+        return list(map(list, zip(sources.tolist(), targets.tolist())))
 
     # get neighbors of specific node n
     def neighbors(self, node):
         number = self._map_node_to_number[node]
-        idx = self._index_list[number]
-        idx_end = self._index_list[number+1]
-        neighbors_list = [0] * (idx_end-idx)
-        if self.is_weighted():
-            weights_list = self._weights_list[idx: idx_end]
-        for i, neighbor in enumerate(self._neighbors_list[idx: idx_end]):
+        row_neighbors, weights_list = self._row(number)
+        if self.interned:
+            if self.is_weighted():
+                return row_neighbors, weights_list
+            return row_neighbors
+        if self.storage != "list":
+            neighbors_list = [self._map_number_to_node[neighbor] for neighbor in row_neighbors.tolist()]
+            if self.is_weighted():
+                return neighbors_list, weights_list
+            return neighbors_list
+        neighbors_list = [0] * len(row_neighbors)
+        for i, neighbor in enumerate(row_neighbors):
             neighbors_list[i] = self._map_number_to_node[neighbor]
         if self.is_weighted():
             return neighbors_list, weights_list
         else:
             return neighbors_list
 
-    # get neighbors and weights for every node
+    # get the numbers of the neighbors of node n (and their weights) as they are stored.
+    # with numpy storage these are views into the graph arrays, no copy is made (unless the row has changes in
+    # the delta, then it is merged into new arrays).
+    def neighbors_view(self, node):
+        neighbors_list, weights_list = self._row(self._map_node_to_number[node])
+        if self.is_weighted():
+            return neighbors_list, weights_list
+        return neighbors_list
+
+    # get neighbors and weights for every node, as a read only view: graph_adjacency()[node][neighbor]['weight']
     def graph_adjacency(self):
-        graph_adjacency_dict = dict()
-        for number in range(len(self._index_list) - 1):
-            node = self._map_number_to_node[number]
-            if node not in graph_adjacency_dict.keys():
-                graph_adjacency_dict[node] = dict()
+        return AdjacencyView(self)
 
-            if self.is_weighted():
-                neighbors_list, weights_list = self.neighbors(node)
-                for neighbor, weight in zip(neighbors_list, weights_list):
-                    graph_adjacency_dict[node][neighbor] = {'weight': weight}
-            else:
-                neighbors_list = self.neighbors(node)
-                for neighbor in neighbors_list:
-                    graph_adjacency_dict[node][neighbor] = {'weight': 1}
-        return graph_adjacency_dict
-
-    # Add new edges to the graph, but with limitations:
-    # For example, if the edge is [w,v] and the graph is diracted, w can't be an existing node.
-    # if the graph is not diracted, w and v can't be existing nodes.
-    def add_edges(self, edges):
-        last_index = self._index_list[-1]
-        index_list = [last_index]
-        neighbors_list = []
-        weights_list = []
-
-        nodes_amount = len(self._map_node_to_number.keys())
-        free = nodes_amount
-        map_node_to_number = OrderedDict()
-
-        '''create dictionary to self._map_node_to_number from edges to our new numbering'''
-        for edge in edges:
-            if (self._map_node_to_number.get(edge[0], None) is not None or
-                (not self.directed and self._map_node_to_number.get(edge[1], None) is not None)):
-                print("Error: add_edges can't add edges from an existing node")
-                return
-            if map_node_to_number.get(edge[0], None) is None:
-                map_node_to_number[edge[0]] = free
-                free += 1
-            if map_node_to_number.get(edge[1], None) is None and self._map_node_to_number.get(edge[1], None) is None:
-                map_node_to_number[edge[1]] = free
-                free += 1
-        '''create the opposite dictionary'''
-        map_number_to_node = OrderedDict((y, x) for x, y in map_node_to_number.items())
-
-        """update the original dicts"""
-        self._map_node_to_number.update(map_node_to_number)
-        self._map_number_to_node.update(map_number_to_node)
-
-        d = OrderedDict()
-        '''starting to create the index list. Unordered is important'''
-        for idx, edge in enumerate(edges):
-            d[self._map_node_to_number[edge[0]]] = d.get(self._map_node_to_number[edge[0]], 0) + 1
-            if not self.directed:
-                d[self._map_node_to_number[edge[1]]] = d.get(self._map_node_to_number[edge[1]], 0) + 1
-            elif self._map_node_to_number[edge[1]] not in d.keys() and edge[1] in map_node_to_number.keys():
-                d[self._map_node_to_number[edge[1]]] = 0
-
-        '''transfer the dictionary to list'''
-        for j in range(1, len(d.keys()) + 1):
-            index_list.append(index_list[j - 1] + d.get(nodes_amount + j - 1, 0))
-
-        '''create the second list'''
+    # the numbers of the nodes, in order. Nodes that are not in the graph are added (after the existing nodes) if
+    # add is True, otherwise they raise a ValueError.
+    def _number_nodes(self, nodes, add=False):
+        numbers = []
+        new_nodes = OrderedDict()
+        first = self.number_of_nodes()
+        for node in nodes:
+            number = self._map_node_to_number.get(node)
+            if number is None:
+                if not add:
+                    raise ValueError(f"The node {node} is not in the graph")
+                number = new_nodes.setdefault(node, first + len(new_nodes))
+            numbers.append(number)
+        if new_nodes:
+            self._check_writable()
+            if self.interned:
+                self._map_node_to_number.check_new_nodes(new_nodes)
+            self._own("nodes")
+            self._map_node_to_number.update(new_nodes)
+            self._map_number_to_node.update(OrderedDict((number, node) for node, number in new_nodes.items()))
+            if self.interned:
+                self._labels = list(self._labels) + list(new_nodes.keys())
+                self._label_to_node = None
+            self._extend_rows()
+        return numbers
+
+    # the numbers of the nodes of edges [[5,1,0.1],[2,3,3]] and their weights (1 if the graph is not weighted or
+    # the edge has no weight)
+    def _number_edges(self, edges, add=False):
+        numbers = self._number_nodes([node for edge in edges for node in edge[:2]], add)
+        weights = [float(edge[2]) if self.is_weighted() and len(edge) > 2 else 1 for edge in edges]
+        return numbers[0::2], numbers[1::2], weights
+
+    # add empty rows to the lists (and degrees) for the nodes added to the node maps
+    def _extend_rows(self):
+        count = len(self._map_node_to_number) - self.number_of_nodes()
+        if count <= 0:
+            return
+        if self.storage != "list":
+            self._index_list = np.concatenate((self._index_list, np.full(count, self._index_list[-1],
+                                                                         dtype=self._index_list.dtype)))
+        else:
+            self._own("index")
+            self._index_list += [self._index_list[-1]] * count
+        if self._out_degrees is not None:
+            self._out_degrees = np.concatenate((self._out_degrees, np.zeros(count, dtype=self._out_degrees.dtype)))
+            self._in_degrees = np.concatenate((self._in_degrees, np.zeros(count, dtype=self._in_degrees.dtype)))
+        if self.node_permutation is not None:
+            first = int(self.node_permutation.max(initial=-1)) + 1
+            self.node_permutation = np.concatenate((self.node_permutation, np.arange(first, first + count)))
+
+    # set the edges sources[i] -> targets[i] to weights[i], or remove them where the weight is None.
+    # in an undirected graph both entries of every edge are set.
+    def _set_edges(self, sources, targets, weights):
+        self._check_writable()
+        for number1, number2, weight in zip(sources, targets, weights):
+            self._set_entry(number1, number2, weight)
+            if not self.is_directed() and number1 != number2:
+                self._set_entry(number2, number1, weight)
+        self._compact_if_needed()
+
+    # raises a ValueError, before anything is changed, if the graph is read only (attached with SharedGraph.attach,
+    # its copies are not: they copy the degrees before changing them)
+    def _check_writable(self):
+        if self._out_degrees is not None and not self._out_degrees.flags.writeable and "degrees" not in self._shared:
+            raise ValueError("The graph is read only, change a copy of it")
+
+    # record one change of the lists in the delta and update the degrees with it
+    def _set_entry(self, number1, number2, weight):
+        old_weight = self._entry_weight(number1, number2)
+        if old_weight is None and weight is None:
+            return
+        self._own("delta")
+        changes = self._delta.setdefault(number1, {})
+        if number2 not in changes:
+            self._delta_size += 1
+        changes[number2] = weight
+        self._pending_entries += (weight is not None) - (old_weight is not None)
+        if self._out_degrees is not None:
+            self._own("degrees")
+            if old_weight is not None:
+                self._count_entry(number1, number2, -old_weight)
+            if weight is not None:
+                self._count_entry(number1, number2, weight)
+
+    # add the weight of one entry of the lists to the degrees and the size (like _edges_totals)
+    def _count_entry(self, number1, number2, weight):
+        self._out_degrees[number1] += weight
+        self._in_degrees[number2] += weight
         if self.is_directed():
-            neighbors_list = [-1] * len(edges)
+            self._size += weight
+        elif not self.is_weighted():
+            self._size += weight / 2
+        elif number1 == number2:
+            self._size += weight
         else:
-            neighbors_list = [-1] * len(edges) * 2
+            '''both entries of the edge are counted, each quarter of its weight'''
+            self._size += weight / 4
+
+    # merge the delta into the lists when it grows too big, see DELTA_COMPACT_MIN
+    def _compact_if_needed(self):
+        if self._delta_size > max(DELTA_COMPACT_MIN, DELTA_COMPACT_RATIO * len(self._neighbors_list)):
+            self.compact()
+
+    def _clear_delta(self):
+        self._shared.discard("delta")
+        self._delta = {}
+        self._delta_size = 0
+        self._pending_entries = 0
+
+    # merge the changes in the delta into the lists, all at once: the entries the delta changes are dropped, its
+    # new entries are added, and the rows are sorted again. The degrees are computed again from the new lists.
+    def compact(self):
+        if not self._delta:
+            return
+        nodes_amount = self.number_of_nodes()
+        sources, targets, weights = self._stored_edge_numbers()
+        changes = [(number1, number2, weight) for number1, row_changes in self._delta.items()
+                   for number2, weight in row_changes.items()]
+        changed_sources = np.array([number1 for number1, _, _ in changes], dtype=np.int64)
+        changed_targets = np.array([number2 for _, number2, _ in changes], dtype=np.int64)
+        added = np.array([weight is not None for _, _, weight in changes], dtype=bool)
+        keep = ~np.isin(sources * nodes_amount + targets, changed_sources * nodes_amount + changed_targets)
+
+        sources = np.concatenate((sources[keep], changed_sources[added]))
+        targets = np.concatenate((targets[keep], changed_targets[added]))
+        order = np.lexsort((targets, sources))
+        self._index_list = np.zeros(nodes_amount + 1, dtype=self.dtypes["index"])
+        np.cumsum(np.bincount(sources, minlength=nodes_amount), out=self._index_list[1:])
+        self._neighbors_list = targets[order]
         if self.is_weighted():
-            weights_list = [0] * len(edges)
+            added_weights = np.array([weight for _, _, weight in changes if weight is not None], dtype=np.float64)
+            self._weights_list = np.concatenate((weights[keep], added_weights))[order]
+        self._clear_delta()
+        self._apply_storage()
+        self._compute_degrees()
 
-        space = OrderedDict((x, -1) for x in self._map_number_to_node.keys())
-        for idx, edge in enumerate(edges):
-            left = self._map_node_to_number[edge[0]]
-            right = self._map_node_to_number[edge[1]]
-            if self.is_weighted():
-                weight = float(edge[2])
+    # the number of changes waiting in the delta to be merged into the lists
+    def pending_changes(self):
+        return self._delta_size
 
-            if space[left] != -1:
-                space[left] += 1
-                i = space[left]
-            else:
-                i = index_list[left - nodes_amount] - last_index
-                space[left] = i
-            neighbors_list[i] = right
-            if self.is_weighted():
-                weights_list[i] = weight
+    # Add nodes without edges, nodes that are already in the graph are ignored.
+    # In an interned graph new nodes are numbered consecutively after the existing ones.
+    def add_nodes(self, nodes):
+        self._number_nodes(nodes, add=True)
 
-            if not self.is_directed():
-                if space[right] != -1:
-                    space[right] += 1
-                    i = space[right]
-                else:
-                    i = index_list[right - len(self._index_list) - 1]
-                    space[right] = i
-                neighbors_list[i] = left
-                if self.is_weighted():
-                    weights_list[i] = weight
+    # Add edges [[5,1,0.1],[2,3,3]] ([[5,1],[2,3]] if the graph is not weighted) between any nodes, the nodes that
+    # are not in the graph are added. An edge that is already in the graph gets the new weight.
+    def add_edges(self, edges):
+        self._set_edges(*self._number_edges(edges, add=True))
 
-        """sort the neighbors"""
-        neighbors_list, weights_list = self.sort_all(index_list=index_list,
-                                                     neighbors_list=neighbors_list,
-                                                     weights_list=weights_list)
+    # Remove edges [[5,1],[2,3]] (weights are ignored), raises a ValueError if one of them is not in the graph
+    def remove_edges(self, edges):
+        sources, targets, _ = self._number_edges(edges)
+        for edge, number1, number2 in zip(edges, sources, targets):
+            if self._entry_weight(number1, number2) is None:
+                raise ValueError(f"The edge {list(edge[:2])} is not in the graph")
+        self._set_edges(sources, targets, [None] * len(sources))
 
-        """update the original dicts"""
-        self._index_list += index_list[1:]
-        self._neighbors_list += neighbors_list
-        self._weights_list += weights_list
+    # Remove nodes and all of their edges. The nodes after them are numbered again to fill the gaps (so in an
+    # interned graph the remaining nodes may change), which rebuilds the lists, so it is better done in batches.
+    def remove_nodes(self, nodes):
+        self._check_writable()
+        removed = np.unique(np.asarray(self._number_nodes(nodes), dtype=np.int64))
+        sources, targets, weights = self._edge_numbers()
+        keep_nodes = np.ones(self.number_of_nodes(), dtype=bool)
+        keep_nodes[removed] = False
+        keep = keep_nodes[sources] & keep_nodes[targets]
+        new_numbers = np.cumsum(keep_nodes) - 1
+        sources, targets = new_numbers[sources[keep]], new_numbers[targets[keep]]
 
+        '''renumbering keeps the order of the nodes, so the rows stay sorted'''
+        nodes_amount = int(keep_nodes.sum())
+        self._index_list = np.zeros(nodes_amount + 1, dtype=self.dtypes["index"])
+        np.cumsum(np.bincount(sources, minlength=nodes_amount), out=self._index_list[1:])
+        self._neighbors_list = targets
+        self._weights_list = weights[keep] if self.is_weighted() else []
+        labels = self.node_labels()
+        self._set_node_labels([labels[number] for number in np.flatnonzero(keep_nodes).tolist()])
+        if self.node_permutation is not None:
+            self.node_permutation = self.node_permutation[keep_nodes]
+        self._apply_storage()
+        self._compute_degrees()
 
-    # swap between two edges, but with limitations.
-    # For example, the graph can only be directed.
-    # The swap can only be in the form of: from edge [a,b] to edge [a, c].
+    # swap between two edges: remove edge_to_delete and add edge_to_add, in any graph and between any nodes.
+    # raises a ValueError if edge_to_delete is not in the graph.
     def swap_edge(self, edge_to_delete, edge_to_add):
-        if not self.directed or (self.directed and edge_to_delete[0] != edge_to_add[0]):
-            print("Error: swap_edge can only be only on directed graph and from the same node")
-            return
-        if not self.is_edge_between_nodes(edge_to_delete[0], edge_to_delete[1]):
-            print("Error: edge_to_delete was not found")
-            return
-        number = self._map_node_to_number[edge_to_add[0]]
-        to_number = self._map_node_to_number[edge_to_add[1]]
-        from_number = self._map_node_to_number[edge_to_delete[1]]
-        start_index_of_source = self._index_list[number]
-        end_index_of_source = self._index_list[number+1]
+        self.remove_edges([edge_to_delete])
+        self.add_edges([edge_to_add])
 
-        neighbors_list = self._neighbors_list[start_index_of_source: end_index_of_source]
-        neighbor_index = self.binary_search(neighbors_list, from_number)
-        neighbors_list[neighbor_index] = to_number
+    # the graph lists, degrees and node names as named numpy arrays and a json-able meta dict, for save.
+    # prefix tells apart the arrays of several graphs saved in one file.
+    def _to_arrays(self, prefix=""):
+        self.compact()
+        if self._out_degrees is None:
+            self._compute_degrees()
+        labels_kind, arrays = encode_labels(self.node_labels(), prefix)
+        arrays[prefix + "index"] = np.asarray(self._index_list, dtype=self.dtypes["index"])
+        arrays[prefix + "neighbors"] = np.asarray(self._neighbors_list, dtype=self.dtypes["neighbors"])
+        arrays[prefix + "weights"] = np.asarray(self._weights_list, dtype=self.dtypes["weights"])
+        arrays[prefix + "out_degrees"] = self._out_degrees
+        arrays[prefix + "in_degrees"] = self._in_degrees
+        if self.node_permutation is not None:
+            arrays[prefix + "node_permutation"] = self.node_permutation
+        meta = {"directed": self.directed, "weighted": self.weighted, "storage": self.storage,
+                "interned": self.interned, "dtypes": {kind: np.dtype(dtype).str for kind, dtype in self.dtypes.items()},
+                "labels": labels_kind, "size": self._size.item() if isinstance(self._size, np.generic) else self._size}
+        return meta, arrays
 
-        if self.is_weighted():
-            weights_list = self._weights_list[start_index_of_source: end_index_of_source]
-            weights_list[neighbor_index] = edge_to_add[2]
-            neighbor_index, weights_list = self.sort_neighbors(neighbors_list, weights_list)
-            self._weights_list[start_index_of_source: end_index_of_source] = weights_list
-            # index_of_replacement = start_index_of_source + neighbor_index
-            # neighbors_list[neighbor_index] = to_number
-            # weights_list[neighbor_index] = edge_to_add[2]
-        else:
-            neighbor_index, weights_list = self.sort_neighbors(neighbors_list)
-        self._neighbors_list[start_index_of_source: end_index_of_source] = neighbor_index
+    # a graph from the meta and arrays of _to_arrays
+    @staticmethod
+    def _from_arrays(meta, arrays, prefix=""):
+        graph = LolGraph(directed=meta["directed"], weighted=meta["weighted"], storage=meta["storage"],
+                         dtypes={kind: np.dtype(dtype) for kind, dtype in meta["dtypes"].items()},
+                         interned=meta["interned"])
+        graph._index_list = arrays[prefix + "index"]
+        graph._neighbors_list = arrays[prefix + "neighbors"]
+        graph._weights_list = arrays[prefix + "weights"] if graph.weighted else []
+        graph._apply_storage()
+        graph._set_node_labels(decode_labels(meta["labels"], arrays, prefix, lazy=graph.interned))
+        graph._out_degrees = arrays[prefix + "out_degrees"]
+        graph._in_degrees = arrays[prefix + "in_degrees"]
+        graph._size = meta["size"]
+        graph.node_permutation = arrays.get(prefix + "node_permutation")
+        return graph
+
+    # save the graph into one binary file, that load can open without building the graph again
+    def save(self, path):
+        meta, arrays = self._to_arrays()
+        meta["class"] = type(self).__name__
+        write_arrays_file(path, meta, arrays)
+
+    # open a graph saved by save. With mmap=True (and numpy storage) the graph arrays are memory maps of the file,
+    # so opening is immediate and processes that load the same file share its memory.
+    @classmethod
+    def load(cls, path, mmap=True):
+        meta, arrays = read_arrays_file(path, mmap)
+        if meta.get("class") != cls.__name__:
+            raise ValueError(f"{path} holds a {meta.get('class')}, not a {cls.__name__}")
+        return cls._restore(meta, arrays)
+
+    # the graph of the meta and arrays of _to_arrays, for load and SharedGraph.attach
+    @classmethod
+    def _restore(cls, meta, arrays):
+        return cls._from_arrays(meta, arrays)
+
+    # put the arrays of this graph in shared memory for other processes, see SharedGraph
+    def share(self):
+        return SharedGraph(self)
+
+    # the memory (in bytes) of every part of the graph, counting every object it holds (boxed numbers, node names,
+    # nested dicts) once, see deep_sizeof. Objects already in seen are not counted again, so graphs that share
+    # parts (copies, a DLGW and its reversed graph) can be reported together.
+    def memory_report(self, seen=None):
+        seen = set() if seen is None else seen
+        report = OrderedDict()
+        report["index"] = deep_sizeof(self._index_list, seen=seen)
+        report["neighbors"] = deep_sizeof(self._neighbors_list, seen=seen)
+        report["weights"] = deep_sizeof(self._weights_list, seen=seen)
+        report["degrees"] = deep_sizeof(self._out_degrees, self._in_degrees, seen=seen)
+        report["node_maps"] = deep_sizeof(self._map_node_to_number, self._map_number_to_node, self.node_permutation,
+                                          seen=seen)
+        report["labels"] = deep_sizeof(self._labels, self._label_to_node, seen=seen)
+        report["delta"] = deep_sizeof(self._delta, seen=seen)
+        return report
 
-    # get memory usage of the lol object
+    # get memory usage of the lol object, in bytes (see memory_report)
     def get_memory(self):
-        return sum([sys.getsizeof(var) for var in [self._index_list, self._neighbors_list, self._weights_list,
-                                                   self._map_node_to_number, self._map_number_to_node,
-                                                   self.directed, self.weighted]])
+        return sum(self.memory_report().values())
 
 
 if __name__ == '__main__':
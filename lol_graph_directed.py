@@ -3,39 +3,169 @@ from lol_graph import *
 
 # Directed Lol Graph Wrapper
 class DLGW:
-    def __init__(self, weighted=True):
-        self.lol_directed = LolGraph(directed=True, weighted=weighted)
-        self.reversed_lol = LolGraph(directed=True, weighted=weighted)
+    # The reversed graph (for predecessors and in_degree) is the transpose of lol_directed and numbers the nodes
+    # the same way. With lazy_reverse=True it is only built on the first call that needs it.
+    def __init__(self, weighted=True, storage="list", dtypes=None, interned=False, lazy_reverse=False):
+        self.lol_directed = LolGraph(directed=True, weighted=weighted, storage=storage, dtypes=dtypes,
+                                     interned=interned)
+        self.lazy_reverse = lazy_reverse
+        self._reversed_lol = None
 
-    def convert(self, graph):
-        self.lol_directed.convert(graph)
-        self.reversed_lol.convert(self.reverse_edges(graph))
+    @property
+    def reversed_lol(self):
+        if self._reversed_lol is None:
+            self._reversed_lol = self.lol_directed.transpose()
+        return self._reversed_lol
 
-    def reverse_edges(self, graph):
-        if self.reversed_lol.is_weighted():
-            graph = [[edge[1], edge[0], edge[2]] for edge in graph]
-        else:
-            graph = [[edge[1], edge[0]] for edge in graph]
+    @reversed_lol.setter
+    def reversed_lol(self, reversed_lol):
+        self._reversed_lol = reversed_lol
+
+    # drop the reversed graph after lol_directed has changed, it is built again when needed
+    def _reset_reverse(self):
+        self._reversed_lol = None
+        if not self.lazy_reverse:
+            self._reversed_lol = self.lol_directed.transpose()
+
+    def convert(self, graph, cutoff=None, top_k=None, reorder=None):
+        self.convert_from_arrays(*edges_columns(graph, self.is_weighted()), cutoff=cutoff, top_k=top_k,
+                                 reorder=reorder)
+
+    def convert_from_arrays(self, sources, targets, weights=None, cutoff=None, top_k=None, reorder=None):
+        self.lol_directed.convert_from_arrays(sources, targets, weights, cutoff=cutoff, top_k=top_k, reorder=reorder)
+        self._reset_reverse()
+
+    # see LolGraph.sparsify
+    def sparsify(self, cutoff=None, top_k=None):
+        self.lol_directed.sparsify(cutoff, top_k)
+        self._reset_reverse()
+
+    # see LolGraph.permute_nodes
+    def permute_nodes(self, order):
+        self.lol_directed.permute_nodes(order)
+        self._reset_reverse()
+
+    # see LolGraph.reorder_nodes
+    def reorder_nodes(self, method="rcm"):
+        self.permute_nodes(self.lol_directed.locality_order(method))
+
+    # see LolGraph.node_permutation
+    @property
+    def node_permutation(self):
+        return self.lol_directed.node_permutation
+
+    # see LolGraph.subgraph
+    def subgraph(self, nodes):
+        return self._wrap(self.lol_directed.subgraph(nodes))
+
+    # a new DLGW (with the same settings) around a LolGraph
+    def _wrap(self, lol_directed):
+        graph = DLGW(weighted=self.is_weighted(), storage=lol_directed.storage, dtypes=lol_directed.dtypes,
+                     interned=self.is_interned(), lazy_reverse=self.lazy_reverse)
+        graph.lol_directed = lol_directed
+        graph._reset_reverse()
         return graph
 
+    def relabel_nodes(self, function):
+        self.lol_directed.relabel_nodes(function)
+        if self._reversed_lol is not None:
+            self._reversed_lol._share_nodes(self.lol_directed)
+
     def is_directed(self):
         return self.lol_directed.is_directed()
 
     def is_weighted(self):
         return self.lol_directed.is_weighted()
 
+    def is_interned(self):
+        return self.lol_directed.interned
+
     def number_of_edges(self):
         return self.lol_directed.number_of_edges()
 
     def number_of_nodes(self):
         return self.lol_directed.number_of_nodes()
 
+    # the forward graph arrays, and the reversed graph arrays if it was built (prefix "reversed_")
+    def _to_arrays(self):
+        meta, arrays = self.lol_directed._to_arrays()
+        meta["lazy_reverse"] = self.lazy_reverse
+        meta["reversed"] = self._reversed_lol is not None
+        if self._reversed_lol is not None:
+            reversed_lol = self._reversed_lol
+            arrays["reversed_index"] = np.asarray(reversed_lol._index_list, dtype=reversed_lol.dtypes["index"])
+            arrays["reversed_neighbors"] = np.asarray(reversed_lol._neighbors_list,
+                                                      dtype=reversed_lol.dtypes["neighbors"])
+            arrays["reversed_weights"] = np.asarray(reversed_lol._weights_list, dtype=reversed_lol.dtypes["weights"])
+        return meta, arrays
+
+    def _load_arrays(self, meta, arrays):
+        self.lol_directed = LolGraph._from_arrays(meta, arrays)
+        self.lazy_reverse = meta["lazy_reverse"]
+        self._reversed_lol = None
+        if meta["reversed"]:
+            reversed_lol = LolGraph(directed=True, weighted=self.is_weighted(), storage=self.lol_directed.storage,
+                                    dtypes=self.lol_directed.dtypes, interned=self.is_interned())
+            reversed_lol._index_list = arrays["reversed_index"]
+            reversed_lol._neighbors_list = arrays["reversed_neighbors"]
+            reversed_lol._weights_list = arrays["reversed_weights"] if self.is_weighted() else []
+            reversed_lol._apply_storage()
+            reversed_lol._share_nodes(self.lol_directed)
+            reversed_lol._out_degrees = self.lol_directed._in_degrees
+            reversed_lol._in_degrees = self.lol_directed._out_degrees
+            reversed_lol._size = self.lol_directed._size
+            self._reversed_lol = reversed_lol
+        elif not self.lazy_reverse:
+            self._reset_reverse()
+
+    # save the graph into one binary file, see LolGraph.save
+    def save(self, path):
+        meta, arrays = self._to_arrays()
+        meta["class"] = type(self).__name__
+        write_arrays_file(path, meta, arrays)
+
+    # open a graph saved by save, see LolGraph.load
+    @classmethod
+    def load(cls, path, mmap=True):
+        meta, arrays = read_arrays_file(path, mmap)
+        if meta.get("class") != cls.__name__:
+            raise ValueError(f"{path} holds a {meta.get('class')}, not a {cls.__name__}")
+        return cls._restore(meta, arrays)
+
+    # the graph of the meta and arrays of _to_arrays, for load and SharedGraph.attach
+    @classmethod
+    def _restore(cls, meta, arrays):
+        graph = cls()
+        graph._load_arrays(meta, arrays)
+        return graph
+
+    # put the arrays of this graph in shared memory for other processes, see SharedGraph
+    def share(self):
+        return SharedGraph(self)
+
     def copy(self):
-        new_lol = DLGW()
+        new_lol = DLGW(weighted=self.is_weighted(), storage=self.lol_directed.storage, dtypes=self.lol_directed.dtypes,
+                       interned=self.is_interned(), lazy_reverse=self.lazy_reverse)
         new_lol.lol_directed = self.lol_directed.copy()
-        new_lol.reversed_lol = self.reversed_lol.copy()
+        if self._reversed_lol is not None:
+            new_lol.reversed_lol = self._reversed_lol.copy()
+            new_lol.reversed_lol._share_nodes(new_lol.lol_directed)
+        if hasattr(self, "_shared_memory"):
+            new_lol._shared_memory = self._shared_memory
         return new_lol
 
+    # the memory of every part of lol_directed (see LolGraph.memory_report) and of the reversed graph, without
+    # the node maps and names it shares with lol_directed
+    def memory_report(self, seen=None):
+        seen = set() if seen is None else seen
+        report = self.lol_directed.memory_report(seen)
+        report["reverse_graph"] = sum(self._reversed_lol.memory_report(seen).values()) \
+            if self._reversed_lol is not None else 0
+        return report
+
+    def get_memory(self):
+        return sum(self.memory_report().values())
+
     def out_degree(self, node):
         return self.lol_directed.out_degree(node)
 
@@ -46,7 +176,13 @@ class DLGW:
         return self.lol_directed.nodes_binary_search(arr, x)
 
     def in_degree(self, node):
-        return self.reversed_lol.out_degree(node)
+        return self.lol_directed.in_degree(node)
+
+    def out_degrees(self):
+        return self.lol_directed.out_degrees()
+
+    def in_degrees(self):
+        return self.lol_directed.in_degrees()
 
     def predecessors(self, node):
         if self.reversed_lol.is_weighted():
@@ -55,12 +191,35 @@ class DLGW:
             neighbors_list = self.reversed_lol.neighbors(node)
         return neighbors_list
 
+    # the predecessors of node and the weights of their edges to node (1 in an unweighted graph), read from the row of
+    # node in the reversed graph, without looking every edge up
+    def predecessors_and_weights(self, node):
+        if self.reversed_lol.is_weighted():
+            return self.reversed_lol.neighbors(node)
+        neighbors_list = self.reversed_lol.neighbors(node)
+        return neighbors_list, [1] * len(neighbors_list)
+
     def nodes(self):
         return self.lol_directed.nodes()
 
+    def node_label(self, node):
+        return self.lol_directed.node_label(node)
+
+    def node_labels(self):
+        return self.lol_directed.node_labels()
+
+    def node_from_label(self, label):
+        return self.lol_directed.node_from_label(label)
+
     def edges(self):
         return self.lol_directed.edges()
 
+    def iter_edges(self):
+        return self.lol_directed.iter_edges()
+
+    def edge_arrays(self, numbers=False):
+        return self.lol_directed.edge_arrays(numbers)
+
     def is_edge_between_nodes(self, node1, node2):
         return self.lol_directed.is_edge_between_nodes(node1, node2)
 
@@ -70,6 +229,12 @@ class DLGW:
     def get_edge_data(self, node1, node2, default=None):
         return self.lol_directed.get_edge_data(node1, node2, default)
 
+    def get_edge_data_many(self, pairs, default=np.nan):
+        return self.lol_directed.get_edge_data_many(pairs, default)
+
+    def edge_position(self, node1, node2):
+        return self.lol_directed.edge_position(node1, node2)
+
     # convert back to [[5,1,0.1],[2,3,3],[5,3,0.2],[4,5,9]] format using self dicts
     def convert_back(self):
         return self.lol_directed.convert_back()
@@ -78,15 +243,51 @@ class DLGW:
     def neighbors(self, node):
         return self.lol_directed.neighbors(node)
 
+    def neighbors_view(self, node):
+        return self.lol_directed.neighbors_view(node)
+
     # get neighbors and weights for every node
     def graph_adjacency(self):
         return self.lol_directed.graph_adjacency()
 
+    # the reversed graph gets the same changes (reversed) as lol_directed, so it is not built again
+    def _reverse_changes(self, sources, targets, weights):
+        if self._reversed_lol is None:
+            return
+        self._reversed_lol._share_nodes(self.lol_directed)
+        self._reversed_lol._extend_rows()
+        self._reversed_lol._set_edges(targets, sources, weights)
+
+    def add_nodes(self, nodes):
+        self.lol_directed.add_nodes(nodes)
+        self._reverse_changes([], [], [])
+
     def add_edges(self, edges):
-        return self.lol_directed.add_edges(edges)
+        sources, targets, weights = self.lol_directed._number_edges(edges, add=True)
+        self.lol_directed._set_edges(sources, targets, weights)
+        self._reverse_changes(sources, targets, weights)
+
+    def remove_edges(self, edges):
+        self.lol_directed.remove_edges(edges)
+        sources, targets, _ = self.lol_directed._number_edges(edges)
+        self._reverse_changes(sources, targets, [None] * len(sources))
+
+    # the nodes are numbered again, so the reversed graph is built again
+    def remove_nodes(self, nodes):
+        self.lol_directed.remove_nodes(nodes)
+        self._reset_reverse()
 
     def swap_edge(self, edge_to_delete, edge_to_add):
-        return self.lol_directed.swap_edge(edge_to_delete, edge_to_add)
+        self.remove_edges([edge_to_delete])
+        self.add_edges([edge_to_add])
+
+    def compact(self):
+        self.lol_directed.compact()
+        if self._reversed_lol is not None:
+            self._reversed_lol.compact()
+
+    def pending_changes(self):
+        return self.lol_directed.pending_changes()
 
 if __name__ == "__main__":
     print("success")
@@ -1,57 +1,265 @@
 import os
 import numpy as np
-from collections import OrderedDict
+import pandas as pd
 from lol_graph_directed import *
-import csv
+
+
+# the names "<group>_<id>" of the given node ids
+def group_names(group, ids):
+    return (str(group) + "_" + pd.Series(ids, dtype=str)).to_numpy()
 
 
 class MultipartiteLol(DLGW):
-    def __init__(self, groups_number=0, weighted=True):
-        super().__init__(weighted=weighted)
+    def __init__(self, groups_number=0, weighted=True, storage="list", dtypes=None, interned=False,
+                 lazy_reverse=False):
+        super().__init__(weighted=weighted, storage=storage, dtypes=dtypes, interned=interned,
+                         lazy_reverse=lazy_reverse)
         self.groups_number = groups_number
-        self.nodes_type_dict = {}
+        self._nodes_type_dict = {}
+        self._nodes_type_dict_shared = False
+        # for interned graphs the group of every node is kept in an array instead of nodes_type_dict
+        self.node_groups = None
+        self._type_vectors = None
+        # after order_by_group the nodes of group g are numbered group_offsets[g], ..., group_offsets[g + 1] - 1
+        self.group_offsets = None
 
-    def convert_with_csv(self, files_name, graphs_directions=None, header=True):
+    # cutoff and top_k sparsify the graph as it is built, see LolGraph.sparsify.
+    # with order_by_group=True the nodes are numbered group by group, see order_by_group, and with reorder (one of
+    # NODE_ORDERS) by reorder_nodes, or inside every group if order_by_group is also given (e.g. group-then-degree).
+    def convert_with_csv(self, files_name, graphs_directions=None, header=True, cutoff=None, top_k=None,
+                         order_by_group=False, reorder=None):
         s = set()
         for t in graphs_directions:
             s.add(t[0])
             s.add(t[1])
         self.groups_number = len(s)
 
-        # self._map_node_to_number = OrderedDict()
-        graph = []
-        for i in range(len(files_name)):
-            file = files_name[i]
-            with open(file, "r") as csvfile:
-                datareader = csv.reader(csvfile)
-                if header:
-                    next(datareader, None)  # skip the headers
-                for edge in datareader:
-                    named_edge = [str(graphs_directions[i][0]) + "_" + edge[0],
-                                  str(graphs_directions[i][1]) + "_" + edge[1]]
-                    if self.is_weighted():
-                        named_edge.append(float(edge[2]))
-                    graph.append(named_edge)
-                csvfile.close()
-        self.convert(graph)
+        files_edges = [read_edges_csv(file, header, self.is_weighted()) for file in files_name]
+        sources = [file_sources for file_sources, _, _ in files_edges]
+        targets = [file_targets for _, file_targets, _ in files_edges]
+        weights = np.concatenate([file_weights for _, _, file_weights in files_edges]) if self.is_weighted() else None
+        ids = sources + targets
+        if all(isinstance(group, int) and group >= 0 for group in s) and \
+                all(np.issubdtype(file_ids.dtype, np.integer) and not (file_ids < 0).any() for file_ids in ids):
+            # the group is added to the integer ids as an offset, and the names "<group>_<id>" are created only
+            # once for every node, after the graph is built.
+            stride = max([int(file_ids.max()) for file_ids in ids if len(file_ids)], default=0) + 1
+            sources = [file_sources + direction[0] * stride
+                       for file_sources, direction in zip(sources, graphs_directions)]
+            targets = [file_targets + direction[1] * stride
+                       for file_targets, direction in zip(targets, graphs_directions)]
+            self.convert_from_arrays(np.concatenate(sources), np.concatenate(targets), weights, cutoff=cutoff,
+                                     top_k=top_k)
+            if self.is_interned():
+                self.node_groups = (np.asarray(self.node_labels(), dtype=np.int64) // stride).astype(np.uint8)
+            self.relabel_nodes(lambda key: f"{key // stride}_{key % stride}")
+        else:
+            sources = [group_names(direction[0], file_sources)
+                       for file_sources, direction in zip(sources, graphs_directions)]
+            targets = [group_names(direction[1], file_targets)
+                       for file_targets, direction in zip(targets, graphs_directions)]
+            self.convert_from_arrays(np.concatenate(sources), np.concatenate(targets), weights, cutoff=cutoff,
+                                     top_k=top_k)
+        if order_by_group:
+            self.order_by_group(reorder)
+        elif reorder is not None:
+            self.reorder_nodes(reorder)
+
+    # the {node: {'type': type vector}} dict, shared with copies of the graph until it is asked for to be changed
+    @property
+    def nodes_type_dict(self):
+        if self._nodes_type_dict_shared:
+            self._nodes_type_dict = {node: data.copy() for node, data in self._nodes_type_dict.items()}
+            self._nodes_type_dict_shared = False
+        return self._nodes_type_dict
+
+    @nodes_type_dict.setter
+    def nodes_type_dict(self, nodes_type_dict):
+        self._nodes_type_dict = nodes_type_dict
+        self._nodes_type_dict_shared = False
 
     def return_node_type(self, node):
-        return self.nodes_type_dict[node]['type']
+        if self.is_interned():
+            return self._type_vectors[self.node_groups[node]]
+        return self._nodes_type_dict[node]['type']
+
+    def node_group(self, node):
+        if self.is_interned():
+            return int(self.node_groups[node])
+        return int(node[0])
 
     def copy(self):
-        new_mp_lol_graph = MultipartiteLol()
-        new_mp_lol_graph.reversed_lol = self.reversed_lol.copy()
+        new_mp_lol_graph = MultipartiteLol(weighted=self.is_weighted(), storage=self.lol_directed.storage,
+                                           dtypes=self.lol_directed.dtypes, interned=self.is_interned(),
+                                           lazy_reverse=self.lazy_reverse)
         new_mp_lol_graph.lol_directed = self.lol_directed.copy()
+        if self._reversed_lol is not None:
+            new_mp_lol_graph.reversed_lol = self._reversed_lol.copy()
+            new_mp_lol_graph.reversed_lol._share_nodes(new_mp_lol_graph.lol_directed)
+        if hasattr(self, "_shared_memory"):
+            new_mp_lol_graph._shared_memory = self._shared_memory
         new_mp_lol_graph.groups_number = self.groups_number
-        new_mp_lol_graph.nodes_type_dict = self.nodes_type_dict.copy()
+        new_mp_lol_graph._nodes_type_dict = self._nodes_type_dict
+        self._nodes_type_dict_shared = new_mp_lol_graph._nodes_type_dict_shared = True
+        new_mp_lol_graph.node_groups = self.node_groups
+        new_mp_lol_graph._type_vectors = self._type_vectors
+        new_mp_lol_graph.group_offsets = self.group_offsets
         return new_mp_lol_graph
 
+    # the group of every node, by the nodes numbers
+    def _groups_array(self):
+        if self.is_interned():
+            if self.node_groups is None:
+                self.node_groups = np.array([int(str(label)[0]) for label in self.node_labels()], dtype=np.uint8)
+            return self.node_groups
+        return np.array([self.node_group(node) for node in self.nodes()], dtype=np.int64)
+
+    # where every group starts in the numbering of group sorted nodes of the given groups, see group_offsets
+    def _group_offsets(self, groups):
+        groups = np.asarray(groups, dtype=np.int64)
+        offsets = np.zeros(max(self.groups_number, int(groups.max(initial=-1)) + 1) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(groups, minlength=len(offsets) - 1), out=offsets[1:])
+        return offsets
+
+    # number the nodes group after group (keeping their order inside every group, or ordering them by reorder, one of
+    # NODE_ORDERS), so every group is a contiguous range of node numbers (see group_offsets) and block can slice a
+    # group's rows instead of filtering every edge. In an interned graph the nodes are numbered again.
+    def order_by_group(self, reorder=None):
+        groups = self._groups_array()
+        order = np.arange(self.number_of_nodes()) if reorder is None else self.lol_directed.locality_order(reorder)
+        order = order[np.argsort(groups[order], kind="stable")]
+        self.permute_nodes(order)
+        self.group_offsets = self._group_offsets(groups[order])
+
+    # see LolGraph.permute_nodes, the groups of the nodes move with them
+    def permute_nodes(self, order):
+        super().permute_nodes(order)
+        if self.node_groups is not None:
+            self.node_groups = self.node_groups[np.asarray(order, dtype=np.int64)]
+        self.group_offsets = None
+
+    # a new MultipartiteLol (with the same settings and groups) around a LolGraph of the nodes kept_numbers
+    def _wrap_kept(self, lol_directed, kept_numbers):
+        graph = MultipartiteLol(groups_number=self.groups_number, weighted=self.is_weighted(),
+                                storage=lol_directed.storage, dtypes=lol_directed.dtypes, interned=self.is_interned(),
+                                lazy_reverse=self.lazy_reverse)
+        graph.lol_directed = lol_directed
+        graph._reset_reverse()
+        if self.node_groups is not None:
+            graph.node_groups = self.node_groups[kept_numbers]
+        graph._type_vectors = self._type_vectors
+        if self._nodes_type_dict:
+            graph._nodes_type_dict = {node: self._nodes_type_dict[node] for node in lol_directed.nodes()}
+            self._nodes_type_dict_shared = graph._nodes_type_dict_shared = True
+        if self.group_offsets is not None:
+            graph.group_offsets = self._group_offsets(self._groups_array()[kept_numbers])
+        return graph
+
+    # the graph of some of the nodes and the edges between them, see LolGraph.subgraph
+    def subgraph(self, nodes):
+        kept_numbers = np.unique(np.asarray(self.lol_directed._number_nodes(nodes), dtype=np.int64))
+        return self._wrap_kept(self.lol_directed.subgraph(nodes), kept_numbers)
+
+    # the graph of the nodes of two groups with only the edges from src_group to dst_group (the block of the
+    # adjacency matrix). After order_by_group only the rows of src_group are read, otherwise all the edges are
+    # filtered by the groups of their nodes at once.
+    def block(self, src_group, dst_group):
+        lol = self.lol_directed
+        lol.compact()
+        if self.group_offsets is not None:
+            first, last = self.group_offsets[src_group], self.group_offsets[src_group + 1]
+            index_list = np.asarray(lol._index_list[first: last + 1], dtype=np.int64)
+            sources = np.repeat(np.arange(first, last), np.diff(index_list))
+            targets = np.asarray(lol._neighbors_list[index_list[0]: index_list[-1]], dtype=np.int64)
+            weights = np.asarray(lol._weights_list[index_list[0]: index_list[-1]], dtype=np.float64) \
+                if self.is_weighted() else None
+            keep = (targets >= self.group_offsets[dst_group]) & (targets < self.group_offsets[dst_group + 1])
+            keep_nodes = np.zeros(self.number_of_nodes(), dtype=bool)
+            keep_nodes[first: last] = True
+            keep_nodes[self.group_offsets[dst_group]: self.group_offsets[dst_group + 1]] = True
+        else:
+            groups = self._groups_array()
+            sources, targets, weights = lol._edge_numbers()
+            keep = (groups[sources] == src_group) & (groups[targets] == dst_group)
+            keep_nodes = (groups == src_group) | (groups == dst_group)
+        weights = weights[keep] if self.is_weighted() else None
+        block_lol = lol._kept_graph(keep_nodes, sources[keep], targets[keep], weights)
+        return self._wrap_kept(block_lol, np.flatnonzero(keep_nodes))
+
+    # the memory of the DLGW parts (see DLGW.memory_report) and of the groups and types of the nodes
+    def memory_report(self, seen=None):
+        seen = set() if seen is None else seen
+        report = super().memory_report(seen)
+        report["node_types"] = deep_sizeof(self._nodes_type_dict, self.node_groups, self._type_vectors,
+                                            self.group_offsets, seen=seen)
+        return report
+
+    # the DLGW arrays, with the groups of the nodes
+    def _to_arrays(self):
+        meta, arrays = super()._to_arrays()
+        meta["groups_number"] = self.groups_number
+        meta["nodes_types"] = self._type_vectors is not None or bool(self._nodes_type_dict)
+        if self.node_groups is not None:
+            arrays["node_groups"] = self.node_groups
+        if self.group_offsets is not None:
+            arrays["group_offsets"] = self.group_offsets
+        return meta, arrays
+
+    def _load_arrays(self, meta, arrays):
+        super()._load_arrays(meta, arrays)
+        self.groups_number = meta["groups_number"]
+        self.node_groups = arrays.get("node_groups")
+        self.group_offsets = arrays.get("group_offsets")
+        if meta["nodes_types"]:
+            self.set_nodes_type_dict()
+
     def set_nodes_type_dict(self):
-        for node in self.nodes():
+        if self.is_interned():
+            self._groups_array()
+            self._type_vectors = np.eye(self.groups_number, dtype=np.int64)
+            self._type_vectors.flags.writeable = False
+            return
+        self._set_nodes_types(self.nodes())
+
+    def _set_nodes_types(self, nodes):
+        for node in nodes:
             node_type = int(node[0])
             type = [1 if i == node_type else 0 for i in range(self.groups_number)]
             self.nodes_type_dict[node] = {'type': type}
 
+    # give the nodes numbered from first on a group (and a type, if the types were set), like set_nodes_type_dict
+    def _add_nodes_groups(self, first):
+        if self.is_interned():
+            if self.node_groups is not None:
+                labels = self.node_labels()[first:]
+                groups = np.array([int(str(label)[0]) for label in labels], dtype=np.uint8)
+                self.node_groups = np.concatenate((self.node_groups, groups))
+        elif self._nodes_type_dict:
+            self._set_nodes_types(self.nodes()[first:])
+        if self.number_of_nodes() > first:
+            '''the new nodes are numbered after all the groups'''
+            self.group_offsets = None
+
+    def add_nodes(self, nodes):
+        first = self.number_of_nodes()
+        super().add_nodes(nodes)
+        self._add_nodes_groups(first)
+
+    def add_edges(self, edges):
+        first = self.number_of_nodes()
+        super().add_edges(edges)
+        self._add_nodes_groups(first)
+
+    def remove_nodes(self, nodes):
+        removed = self.lol_directed._number_nodes(nodes)
+        super().remove_nodes(nodes)
+        if self.node_groups is not None:
+            self.node_groups = np.delete(self.node_groups, removed)
+        for node in nodes:
+            self.nodes_type_dict.pop(node, None)
+        if self.group_offsets is not None:
+            self.group_offsets = self._group_offsets(self._groups_array())
+
     def initialize_nodes_type_dict(self):
         for node in self.nodes():
             self.nodes_type_dict[node] = {}
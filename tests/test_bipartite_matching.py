@@ -0,0 +1,177 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+for module in ("matplotlib", "memory_profiler", "sklearn"):
+    pytest.importorskip(module)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from BipartiteProbabilisticMatching import flow_analytic, flow_numeric
+from BipartiteProbabilisticMatching.matching_solutions import MatchingProblem
+
+PARAMS = {"rho_0": 0.3, "rho_1": 0.6, "epsilon": 1e-10}
+
+
+# a csv file (no header) of random weighted edges between rows 0, ..., 59 and columns 0, ..., 39, so the two sides
+# differ in size
+@pytest.fixture
+def graph_file(tmp_path):
+    rng = np.random.default_rng(0)
+    edges = pd.DataFrame({"source": np.r_[np.arange(60), rng.integers(0, 60, 120)],
+                          "target": np.r_[np.arange(60) % 40, rng.integers(0, 40, 120)],
+                          "weight": rng.integers(1, 10, 180).astype(float)}).drop_duplicates(["source", "target"])
+    file = str(tmp_path / "graph.csv")
+    edges.to_csv(file, header=False, index=False)
+    return file
+
+
+def dense(m):
+    return m.toarray() if sparse.issparse(m) else np.asarray(m)
+
+
+def solve(graph_file, tmp_path, algorithm, params=PARAMS, **kwargs):
+    return MatchingProblem(graph_file, algorithm, params, str(tmp_path / "result.csv"), **kwargs)
+
+
+# the biadjacency matrix of a csv file, built edge by edge, and the labels of its rows and columns
+def dense_biadjacency(file, row_ind=0, col_ind=1):
+    data = pd.read_csv(file, header=None)
+    row_labels, column_labels = sorted(data[row_ind].unique()), sorted(data[col_ind].unique())
+    if data[row_ind].dtype.kind == "i" and data[col_ind].dtype.kind == "i":
+        row_labels, column_labels = list(range(data[row_ind].max() + 1)), list(range(data[col_ind].max() + 1))
+    b = np.zeros((len(row_labels), len(column_labels)))
+    for row, column, weight in zip(data[row_ind], data[col_ind], data[2]):
+        b[row_labels.index(row), column_labels.index(column)] += weight
+    return b, row_labels, column_labels
+
+
+# the flow probabilities of a biadjacency matrix by the dense formulas: p = (1 - r0 - r1) 1 ((1 - r0) I - r1 W)^-1 and
+# c_ij = p_i w_ij / p_j, normalized by rows
+def dense_flow(b, r0=PARAMS["rho_0"], r1=PARAMS["rho_1"], reverse=False):
+    n, m = b.shape
+    w = np.block([[np.zeros((n, n)), b], [b.T, np.zeros((m, m))]])
+    sums = w.sum(axis=1)
+    w = w / np.where(sums == 0, 1., sums)[:, None]
+    p = (1 - r0 - r1) * np.ones(n + m) @ np.linalg.inv((1 - r0) * np.identity(n + m) - r1 * w)
+    rows, columns = (slice(n, n + m), slice(0, n)) if reverse else (slice(0, n), slice(n, n + m))
+    c = np.array([[p[i] * w[i, j] / p[j] for j in range(n + m)[columns]] for i in range(n + m)[rows]])
+    sums = c.sum(axis=1)
+    return c / np.where(sums == 0, 1., sums)[:, None]
+
+
+@pytest.mark.parametrize("solver", ["gmres", "bicgstab", "spsolve"])
+def test_sparse_solvers_match_inverse(graph_file, tmp_path, solver):
+    mp = solve(graph_file, tmp_path, "flow_analytic", dict(PARAMS, solver="inverse"))
+    w = flow_analytic.create_full_normalize_adj(mp.full_adjacency())
+    w_sparse = flow_analytic.create_full_normalize_adj(mp.full_adjacency(), is_sparse=True)
+    p = flow_analytic.calculate_p(w, PARAMS["rho_0"], PARAMS["rho_1"])
+    p_sparse = flow_analytic.calculate_p_sparse(w_sparse, PARAMS["rho_0"], PARAMS["rho_1"], solver)
+    assert p_sparse.shape == p.shape == (1, 100)
+    assert np.allclose(p_sparse, p, rtol=1e-8, atol=0.)
+    sparse_mp = solve(graph_file, tmp_path, "flow_analytic", dict(PARAMS, solver=solver))
+    assert sparse.issparse(sparse_mp.p_mat) and sparse_mp.p_mat.shape == mp.p_mat.shape == (60, 40)
+    assert np.allclose(dense(sparse_mp.p_mat), dense(mp.p_mat), rtol=1e-8, atol=1e-12)
+    assert np.allclose(dense(mp.p_mat), dense_flow(dense(mp.biadjacency)))
+    with pytest.raises(ValueError):
+        solve(graph_file, tmp_path, "flow_analytic", dict(PARAMS, solver="unknown"))
+
+
+# the sides differ in size, so scaling the blocks by the wrong part of p would not cancel in the normalization
+@pytest.mark.parametrize("algorithm", ["flow_analytic", "flow_numeric"])
+def test_flow_non_square(graph_file, tmp_path, algorithm):
+    mp = solve(graph_file, tmp_path, algorithm, reverse_path=str(tmp_path / "reverse.csv"))
+    assert mp.p_mat.shape == (60, 40) and mp.reverse_p_mat.shape == (40, 60)
+    b = dense(mp.biadjacency)
+    assert np.allclose(dense(mp.p_mat), dense_flow(b), atol=1e-8)
+    assert np.allclose(dense(mp.reverse_p_mat), dense_flow(b, reverse=True), atol=1e-8)
+
+
+def test_numeric_matches_analytic(graph_file, tmp_path):
+    numeric = solve(graph_file, tmp_path, "flow_numeric", reverse_path=str(tmp_path / "reverse.csv"))
+    analytic = solve(graph_file, tmp_path, "flow_analytic", reverse_path=str(tmp_path / "reverse.csv"))
+    assert np.allclose(dense(numeric.p_mat), dense(analytic.p_mat), atol=1e-8)
+    assert np.allclose(dense(numeric.reverse_p_mat), dense(analytic.reverse_p_mat), atol=1e-8)
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_contribution_matrix(graph_file, tmp_path, reverse):
+    mp = solve(graph_file, tmp_path, "null_model")
+    w = flow_analytic.create_full_normalize_adj(mp.full_adjacency())
+    p = np.random.default_rng(1).uniform(0.5, 2., (1, 100))
+    rows, columns = (range(60, 100), range(60)) if reverse else (range(60), range(60, 100))
+    expected = np.array([[p[0, i] * w[i, j] / p[0, j] for j in columns] for i in rows])
+    for contribution in (flow_analytic.calculate_contribution_matrix(p, w, mp.shape, reverse),
+                         flow_analytic.calculate_contribution_matrix(p, sparse.csr_matrix(w), mp.shape, reverse),
+                         flow_numeric.calculate_contribution_matrix(p, w, mp.shape, reverse)):
+        assert np.allclose(dense(contribution), expected, rtol=1e-12, atol=0.)
+
+
+# every acceleration reaches the analytic p, and the accelerated ones in fewer iterations than the plain flow
+def test_node_balance_accelerations(graph_file, tmp_path):
+    mp = solve(graph_file, tmp_path, "null_model")
+    w = flow_numeric.normalization(mp.full_adjacency())
+    p = flow_analytic.calculate_p(flow_analytic.create_full_normalize_adj(mp.full_adjacency()), 0.1, 0.85)
+    iterations = {}
+    for acceleration in flow_numeric.ACCELERATIONS:
+        p_balance, residuals = flow_numeric.node_balance(w, 0.1, 0.85, 1e-10, acceleration)
+        assert p_balance.shape == (1, 100) and residuals[-1] <= 1e-10
+        assert np.allclose(p_balance, p, rtol=0., atol=1e-8)
+        iterations[acceleration] = len(residuals)
+    assert iterations["anderson"] < iterations[None] and iterations["krylov"] < iterations[None]
+    with pytest.warns(UserWarning):
+        flow_numeric.node_balance(w, 0.1, 0.85, 1e-10, max_iter=5)
+    with pytest.raises(ValueError):
+        flow_numeric.node_balance(w, 0.1, 0.85, 1e-10, "unknown")
+
+
+# the same edges with string ids, and with no weights column
+def relabel(graph_file, tmp_path):
+    data = pd.read_csv(graph_file, header=None)
+    data[0], data[1] = "u" + data[0].astype(str), "c" + data[1].astype(str)
+    names, unweighted = str(tmp_path / "names.csv"), str(tmp_path / "unweighted.csv")
+    data.to_csv(names, header=False, index=False)
+    data[[0, 1]].to_csv(unweighted, header=False, index=False)
+    return names, unweighted
+
+
+def test_load_graph(graph_file, tmp_path):
+    names, unweighted = relabel(graph_file, tmp_path)
+    for file in (graph_file, names, unweighted):
+        mp = solve(file, tmp_path, "flow_analytic", dict(PARAMS, solver="spsolve"))
+        b, row_labels, column_labels = dense_biadjacency(graph_file if file == graph_file else names)
+        if file == unweighted:
+            b = (b != 0).astype(float)
+        assert mp.biadjacency.format == "csr" and mp.shape == b.shape == (60, 40)
+        assert np.array_equal(dense(mp.biadjacency), b) and mp.is_mapped == (file != graph_file)
+        full = np.block([[np.zeros((60, 60)), b], [b.T, np.zeros((40, 40))]])
+        assert np.array_equal(dense(mp.full_adjacency()), full)
+        assert mp.graph.number_of_nodes() == 100 and mp.graph.number_of_edges() == np.count_nonzero(b)
+        p = dense_flow(b)
+        assert np.allclose(dense(mp.p_mat), p)
+        '''the results are saved by the ids of the file'''
+        result = pd.read_csv(str(tmp_path / "result.csv"))
+        sources, targets = p.nonzero()
+        assert result["Source"].tolist() == [row_labels[i] for i in sources]
+        assert result["Target"].tolist() == [column_labels[j] for j in targets]
+        assert np.allclose(result["Probability"], p[sources, targets])
+
+
+# the reversed problem of reverse_path is the problem of the swapped file columns, solved from the same steady state
+@pytest.mark.parametrize("algorithm", ["flow_analytic", "flow_numeric", "null_model"])
+def test_reverse_path(graph_file, tmp_path, algorithm):
+    names, _ = relabel(graph_file, tmp_path)
+    for file in (graph_file, names):
+        reverse_path = str(tmp_path / "reverse.csv")
+        mp = solve(file, tmp_path, algorithm, reverse_path=reverse_path)
+        swapped = MatchingProblem(file, algorithm, PARAMS, str(tmp_path / "swapped.csv"), row_ind=1, col_ind=0)
+        assert mp.reverse_p_mat.shape == swapped.p_mat.shape == (40, 60)
+        assert np.allclose(dense(mp.reverse_p_mat), dense(swapped.p_mat), atol=1e-8)
+        assert np.allclose(dense(mp.p_mat), dense(solve(file, tmp_path, algorithm).p_mat), atol=1e-8)
+        reverse, expected = pd.read_csv(reverse_path), pd.read_csv(str(tmp_path / "swapped.csv"))
+        assert reverse[["Source", "Target"]].equals(expected[["Source", "Target"]])
+        assert np.allclose(reverse["Probability"], expected["Probability"], atol=1e-8)
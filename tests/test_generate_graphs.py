@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GenerateGraphs"))
+
+from generate_graphs import choose_parts, make_family, make_hackaton_sim_comb, main
+
+
+def read_graph(file):
+    return pd.read_csv(file, header=None, names=["source", "target", "weight"])
+
+
+def test_choose_parts():
+    rng = np.random.default_rng(0)
+    counts = np.array([0, 3, 10, 9, 12, 1])
+    rows, columns = choose_parts(rng, 10, counts)
+    assert np.bincount(rows, minlength=len(counts)).tolist() == np.minimum(counts, 10).tolist()
+    assert (np.lexsort((columns, rows)) == np.arange(len(rows))).all()
+    assert len(set(zip(rows.tolist(), columns.tolist()))) == len(rows)
+    assert ((columns >= 0) & (columns < 10)).all()
+
+
+# without false edges and removed nodes a graph is the true matches (i, i), with the weights of the users
+def test_true_matches_only(tmp_path):
+    files = make_hackaton_sim_comb("nodes", 30, n_users=30, false_num=0., use_span=2., results_root=str(tmp_path))
+    assert len(files) == 3
+    for file in files:
+        graph = read_graph(file)
+        assert graph["source"].tolist() == list(range(1, 31)) and (graph["source"] == graph["target"]).all()
+        assert ((graph["weight"] >= 1) & (graph["weight"] < 100)).all()
+
+
+def test_graph_files(tmp_path):
+    params = dict(n_users=200, false_mass=5., false_num=0.05, user_removed_frac=0.1, comp_removed_frac=0.2)
+    files = make_hackaton_sim_comb("removed_nodes", "x", results_root=str(tmp_path), write_real=True, **params)
+    assert files[0] == os.path.join(str(tmp_path), "data", "removed_nodes", "x_removed_nodes",
+                                    "x_removed_nodes_graph_1.csv")
+    for k, file in enumerate(files, start=1):
+        graph = read_graph(file)
+        real = read_graph(os.path.join(str(tmp_path), "real_data", "removed_nodes", "x_removed_nodes",
+                                       f"x_removed_nodes_real_graph_{k}.csv"))
+        '''sorted by source and target, 1 based, positive weights, the removed users and computers have no edges'''
+        assert (np.lexsort((graph["target"], graph["source"])) == np.arange(len(graph))).all()
+        assert graph[["source", "target"]].min().min() >= 1 and graph[["source", "target"]].max().max() <= 200
+        assert (graph["weight"] > 0).all() and not graph.duplicated(["source", "target"]).any()
+        assert graph["target"].nunique() <= 200 - 20 and graph["source"].nunique() <= 200 - 40
+        assert (real["source"] == real["target"]).all() and (real["weight"] == 1).all()
+        assert real["source"].is_unique and 200 - 20 - 40 <= len(real) <= 200 - 40
+        '''integer weights are written as integers'''
+        with open(file) as f:
+            weights = [line.rstrip("\n").split(",")[2] for line in f]
+        assert not any(weight.endswith(".0") for weight in weights)
+        assert any("." not in weight for weight in weights)
+
+
+def test_seeds(tmp_path):
+    params = dict(n_users=100, false_num=0.05)
+    first = make_hackaton_sim_comb("a", 1, results_root=str(tmp_path / "a"), seed=3, chunk_rows=30, **params)
+    again = make_hackaton_sim_comb("a", 1, results_root=str(tmp_path / "b"), seed=3, chunk_rows=30, **params)
+    other = make_hackaton_sim_comb("a", 1, results_root=str(tmp_path / "c"), seed=4, chunk_rows=30, **params)
+    for file, same, different in zip(first, again, other):
+        assert open(file).read() == open(same).read() != open(different).read()
+
+
+def test_families(tmp_path, capsys):
+    files = make_family("false_mass", [1, 2.5], results_root=str(tmp_path), n_users=20)
+    assert [os.path.basename(file) for file in files[::3]] == ["1_false_mass_graph_1.csv", "2.5_false_mass_graph_1.csv"]
+    with pytest.raises(ValueError):
+        make_family("unknown", [1], results_root=str(tmp_path))
+    main(["noisy_edges", "0.1", "--n-users", "20", "--results-root", str(tmp_path), "--groups", "4"])
+    printed = capsys.readouterr().out.split()
+    assert len(printed) == 6 and all(os.path.exists(file) for file in printed)
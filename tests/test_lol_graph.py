@@ -0,0 +1,450 @@
+import gc
+import os
+import csv
+import sys
+import multiprocessing
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lol_graph import LolGraph, SharedGraph, CompressedNeighbors, STORAGE_MODES, varint_encode, varint_decode
+from lol_graph_directed import DLGW
+from multipartite_lol_graph import MultipartiteLol
+
+EDGES = [[5, 1, 0.1], [2, 3, 3.], [5, 3, 0.2], [4, 5, 9.], [3, 3, 1.5], [1, 2, 2.], [2, 5, 0.5]]
+
+
+# the graph as the lists were built before the vectorized constructor: the nodes are numbered by order of first
+# appearance and every row is sorted by the numbers of the neighbors. returns (nodes, {node: [[neighbor, weight]]}).
+def reference_graph(edges, directed=True):
+    numbers = {}
+    for edge in edges:
+        numbers.setdefault(edge[0], len(numbers))
+        numbers.setdefault(edge[1], len(numbers))
+    rows = {node: [] for node in numbers}
+    for source, target, weight in edges:
+        rows[source].append([target, float(weight)])
+        if not directed and source != target:
+            rows[target].append([source, float(weight)])
+    return list(numbers), {node: sorted(row, key=lambda entry: numbers[entry[0]]) for node, row in rows.items()}
+
+
+# everything the graph answers about its nodes and edges, to compare two graphs. The degrees and the size are
+# rounded, as the ones kept up to date by changes may differ in the last bits from the ones computed again.
+def reads(graph):
+    rows = {}
+    for node in graph.nodes():
+        neighbors, weights = graph.neighbors(node)
+        rows[node] = [[neighbor, float(weight)] for neighbor, weight in zip(list(neighbors), list(weights))]
+    degrees = {node: (round(graph.out_degree(node), 9), round(graph.in_degree(node), 9)) for node in graph.nodes()}
+    edges = sorted(map(tuple, graph.edges()))
+    data = {(edge[0], edge[1]): graph.get_edge_data(edge[0], edge[1]) for edge in edges}
+    return graph.nodes(), rows, degrees, edges, data, round(graph.size(), 9), graph.number_of_edges()
+
+
+def write_csv(path, edges, header=True):
+    with open(path, "w", newline='') as file:
+        writer = csv.writer(file)
+        if header:
+            writer.writerow(["source", "target", "weight"])
+        writer.writerows(edges)
+    return str(path)
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+@pytest.mark.parametrize("directed", [True, False])
+def test_convert_matches_reference(storage, directed):
+    graph = LolGraph(directed=directed, storage=storage)
+    graph.convert(EDGES)
+    nodes, rows = reference_graph(EDGES, directed)
+    assert graph.nodes() == nodes
+    assert {node: [[neighbor, float(weight)] for neighbor, weight in zip(*map(list, graph.neighbors(node)))]
+            for node in nodes} == rows
+    '''an undirected edge counts half of its weight in size, a self loop all of it'''
+    halves = 1 if directed else 2
+    assert graph.size() == pytest.approx(sum(edge[2] if edge[0] == edge[1] else edge[2] / halves for edge in EDGES))
+
+
+# convert_with_csv names the nodes by the text of the files, as reading them with csv.reader and converting did
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+def test_convert_with_csv_matches_csv_reader(tmp_path, storage):
+    files = [write_csv(tmp_path / "a.csv", EDGES), write_csv(tmp_path / "b.csv", [["007", 5, 1.], ["x", "7", 2.]])]
+    rows = []
+    for file in files:
+        with open(file) as csvfile:
+            datareader = csv.reader(csvfile)
+            next(datareader, None)
+            rows += [[edge[0], edge[1], float(edge[2])] for edge in datareader]
+    graph, expected = LolGraph(storage=storage), LolGraph(storage=storage)
+    graph.convert_with_csv(files)
+    expected.convert(rows)
+    assert reads(graph) == reads(expected)
+    assert "007" in graph.nodes() and "7" in graph.nodes()
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+@pytest.mark.parametrize("directed", [True, False])
+def test_delta_reads_match_compacted(storage, directed):
+    graph = LolGraph(directed=directed, storage=storage)
+    graph.convert(EDGES)
+    graph.add_edges([[1, 6, 4.], [5, 1, 0.7], [6, 6, 1.]])
+    graph.remove_edges([[2, 3], [4, 5]])
+    graph.swap_edge([2, 5], [3, 1, 0.3])
+    assert graph.pending_changes() > 0
+    delta_reads = reads(graph)
+    graph.compact()
+    assert graph.pending_changes() == 0
+    assert reads(graph) == delta_reads
+    final_edges = [list(edge) for edge in graph.edges()]
+    rebuilt = LolGraph(directed=directed, storage=storage)
+    rebuilt.add_nodes(graph.nodes())
+    rebuilt.add_edges(final_edges)
+    rebuilt.compact()
+    assert reads(rebuilt) == delta_reads
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+def test_copy_is_isolated(storage):
+    graph = DLGW(storage=storage)
+    graph.convert(EDGES)
+    before = reads(graph)
+    predecessors = graph.predecessors(3)
+    new_graph = graph.copy()
+    new_graph.add_edges([[1, 7, 2.], [5, 1, 3.]])
+    new_graph.remove_edges([[2, 3]])
+    new_graph.remove_nodes([4])
+    assert reads(graph) == before
+    assert graph.predecessors(3) == predecessors
+    after_copy = reads(new_graph)
+    graph.add_edges([[3, 2, 1.]])
+    graph.compact()
+    assert reads(new_graph) == after_copy
+
+
+def test_interned_copy_is_isolated():
+    graph = LolGraph(interned=True)
+    graph.convert_from_arrays(np.array([0, 1, 2]), np.array([1, 2, 0]), np.array([1., 2., 3.]))
+    new_graph = graph.copy()
+    new_graph.add_edges([[3, 0, 1.]])
+    assert graph.number_of_nodes() == 3 and new_graph.number_of_nodes() == 4
+    with pytest.raises(ValueError):
+        new_graph.add_nodes([7])
+    assert new_graph.number_of_nodes() == 4
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+@pytest.mark.parametrize("graph_class", [LolGraph, DLGW])
+def test_save_load_round_trip(tmp_path, storage, graph_class):
+    graph = graph_class(storage=storage)
+    graph.convert(EDGES)
+    graph.add_edges([[1, 6, 4.]])
+    path = str(tmp_path / "graph.lol")
+    graph.save(path)
+    for mmap in (True, False):
+        loaded = graph_class.load(path, mmap=mmap)
+        assert reads(loaded) == reads(graph)
+        if graph_class is DLGW:
+            assert loaded.predecessors(5) == graph.predecessors(5)
+
+
+def test_save_load_keeps_labels(tmp_path):
+    graph = LolGraph(directed=False)
+    graph.convert([["b", "a", 1.], ["é", "b", 2.], ["a", "a", 0.5]])
+    path = str(tmp_path / "graph.lol")
+    graph.save(path)
+    assert reads(LolGraph.load(path)) == reads(graph)
+    graph.relabel_nodes({"a": 1, "b": (2, 3), "é": "é"}.get)
+    with pytest.raises(ValueError):
+        graph.save(path)
+
+
+def test_save_load_multipartite(tmp_path):
+    files = [write_csv(tmp_path / "g01.csv", [[1, 2, 1.], [2, 3, 2.]]), write_csv(tmp_path / "g12.csv", [[2, 1, 3.]])]
+    graph = MultipartiteLol()
+    graph.convert_with_csv(files, graphs_directions=[(0, 1), (1, 2)])
+    path = str(tmp_path / "graph.lol")
+    graph.save(path)
+    loaded = MultipartiteLol.load(path)
+    assert reads(loaded) == reads(graph)
+    assert loaded.groups_number == graph.groups_number == 3
+    assert [loaded.node_group(node) for node in loaded.nodes()] == [graph.node_group(node) for node in graph.nodes()]
+    with pytest.raises(ValueError):
+        LolGraph.load(path)
+
+
+# a row read from an attached graph, after the graph is gone
+def attached_row(handle, node=5):
+    graph = SharedGraph.attach(handle)
+    row = graph.neighbors_view(node)
+    del graph
+    gc.collect()
+    return row
+
+
+@pytest.mark.parametrize("graph_class", [LolGraph, DLGW])
+def test_shared_graph_reads(graph_class):
+    graph = graph_class(storage="numpy")
+    graph.convert(EDGES)
+    with graph.share() as shared:
+        attached = SharedGraph.attach(shared.handle)
+        assert reads(attached) == reads(graph)
+        if graph_class is DLGW:
+            assert attached.predecessors(5) == graph.predecessors(5)
+        del attached
+        neighbors, weights = attached_row(shared.handle)
+        assert neighbors.tolist() == [1, 3] and weights.tolist() == [0.1, 0.2]
+        '''the block stays open while a row read from it is used'''
+        with pytest.raises(BufferError):
+            SharedGraph.detach(shared.handle)
+        del neighbors, weights
+        SharedGraph.detach(shared.handle)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs the fork start method")
+def test_shared_graph_workers():
+    graph = LolGraph(storage="numpy")
+    graph.convert(EDGES)
+    with graph.share() as shared:
+        with multiprocessing.get_context("fork").Pool(2) as pool:
+            rows = pool.map(attached_row, [shared.handle] * 4)
+    assert all(row[0].tolist() == [1, 3] and row[1].tolist() == [0.1, 0.2] for row in rows)
+
+
+@pytest.mark.parametrize("graph_class", [LolGraph, DLGW])
+def test_shared_graph_is_read_only(graph_class):
+    graph = graph_class(storage="numpy")
+    graph.convert(EDGES)
+    with graph.share() as shared:
+        attached = SharedGraph.attach(shared.handle)
+        before = reads(attached)
+        for change in (lambda: attached.add_edges([[5, 2, 1.]]), lambda: attached.add_edges([[5, 8, 1.]]),
+                       lambda: attached.remove_edges([[5, 1]]), lambda: attached.add_nodes([8]),
+                       lambda: attached.remove_nodes([5])):
+            with pytest.raises(ValueError):
+                change()
+        assert reads(attached) == before and attached.pending_changes() == 0
+        new_graph = attached.copy()
+        new_graph.add_edges([[5, 8, 1.]])
+        new_graph.remove_edges([[5, 1]])
+        assert reads(attached) == before
+        assert sorted(map(tuple, new_graph.edges())) == sorted([(5, 8, 1.)] + [tuple(edge) for edge in EDGES[1:]])
+        del attached, new_graph, change
+        gc.collect()
+        SharedGraph.detach(shared.handle)
+
+
+# the weights are python floats in every storage, as in the list storage (numpy scalars print and serialize otherwise)
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+def test_get_edge_data_weights_are_floats(storage):
+    graph = DLGW(storage=storage)
+    graph.convert(EDGES)
+    assert type(graph.get_edge_data(5, 3)["weight"]) is float
+    assert repr(graph.get_edge_data(5, 3)) == "{'weight': 0.2}"
+    graph.add_edges([[5, 3, 0.25]])
+    assert type(graph.get_edge_data(5, 3)["weight"]) is float
+    assert graph.get_edge_data(3, 5, default={}) == {}
+
+
+# the edges kept by sparsify(cutoff, top_k), picked one node at a time: the edges heavier than cutoff, and of them the
+# top_k heaviest out edges of every node, the ones to the nodes that appear first in the edges on ties
+def reference_sparsify(edges, cutoff=None, top_k=None, directed=True):
+    numbers = {}
+    for edge in edges:
+        numbers.setdefault(edge[0], len(numbers))
+        numbers.setdefault(edge[1], len(numbers))
+    rows = {}
+    for source, target, weight in edges:
+        rows.setdefault(source, []).append((source, target, weight))
+        if not directed and source != target:
+            rows.setdefault(target, []).append((target, source, weight))
+    kept = set()
+    for row in rows.values():
+        row = sorted((edge for edge in row if cutoff is None or edge[2] > cutoff),
+                     key=lambda edge: (-edge[2], numbers[edge[1]]))
+        kept.update(row if top_k is None else row[:top_k])
+    if not directed:
+        kept = {(min(a, b), max(a, b), weight) for a, b, weight in kept}
+    return sorted(kept)
+
+
+TIED_EDGES = [[1, 4, 2.], [1, 3, 2.], [1, 2, 2.], [2, 4, 5.], [2, 3, 1.], [3, 4, 0.5], [4, 5, 3.], [5, 5, 3.]]
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+@pytest.mark.parametrize("directed", [True, False])
+@pytest.mark.parametrize("cutoff, top_k", [(None, 1), (None, 2), (1., None), (0.7, 1), (None, 0)])
+def test_sparsify_matches_reference(storage, directed, cutoff, top_k):
+    expected = reference_sparsify(TIED_EDGES, cutoff, top_k, directed)
+    built = LolGraph(directed=directed, storage=storage)
+    built.convert(TIED_EDGES, cutoff=cutoff, top_k=top_k)
+    sparsified = LolGraph(directed=directed, storage=storage)
+    sparsified.convert(TIED_EDGES)
+    sparsified.sparsify(cutoff=cutoff, top_k=top_k)
+    reordered = LolGraph(directed=directed, storage=storage)
+    reordered.convert(TIED_EDGES, reorder="degree")
+    reordered.sparsify(cutoff=cutoff, top_k=top_k)
+    for graph in (built, sparsified, reordered):
+        assert sorted(map(tuple, graph.edges())) == expected
+        assert graph.number_of_nodes() == 5
+
+
+# ties are broken by the nodes numbers, not by the order the edges are given in
+def test_sparsify_ties_do_not_depend_on_edges_order():
+    graph = LolGraph()
+    graph.convert([[1, 2, 1.], [1, 3, 1.], [2, 3, 1.]])
+    for edges in ([[1, 3, 1.], [1, 2, 1.], [2, 3, 1.]], [[1, 2, 1.], [2, 3, 1.], [1, 3, 1.]]):
+        built = LolGraph()
+        built.convert_from_arrays(*zip(*[edge[:2] for edge in edges]), [edge[2] for edge in edges],
+                                  nodes=graph.nodes(), top_k=1)
+        assert sorted(map(tuple, built.edges())) == [(1, 2, 1.), (2, 3, 1.)]
+
+
+def test_sparsify_directed_reverse():
+    graph = DLGW()
+    graph.convert(TIED_EDGES)
+    graph.sparsify(top_k=1)
+    assert sorted(graph.predecessors(4)) == [1, 2, 3] and sorted(graph.predecessors(5)) == [4, 5]
+    assert graph.predecessors(1) == []
+    with pytest.raises(ValueError):
+        graph.sparsify(top_k=-1)
+    with pytest.raises(ValueError):
+        LolGraph(weighted=False).sparsify(top_k=1)
+
+
+# the edges of a 4 x 15 grid, with the nodes named in a random order
+def grid_edges():
+    names = np.random.default_rng(1).permutation(60).tolist()
+    edges = []
+    for row in range(4):
+        for column in range(15):
+            node = row * 15 + column
+            if column < 14:
+                edges.append([names[node], names[node + 1], float(node % 7 + 1)])
+            if row < 3:
+                edges.append([names[node], names[node + 15], 0.5])
+    return edges
+
+
+# the largest difference between the numbers of two neighbors
+def bandwidth(graph):
+    sources, targets, _ = graph.edge_arrays(numbers=True)
+    return int(np.abs(sources - targets).max())
+
+
+# the graph by the names of its nodes: its edges, rows and degrees, whatever the nodes are numbered
+def named_reads(graph):
+    rows = {}
+    for node in graph.nodes():
+        neighbors, weights = graph.neighbors(node)
+        rows[graph.node_label(node)] = {graph.node_label(neighbor): float(weight)
+                                        for neighbor, weight in zip(list(neighbors), list(weights))}
+    degrees = {graph.node_label(node): (graph.out_degree(node), graph.in_degree(node)) for node in graph.nodes()}
+    return rows, degrees, round(graph.size(), 9)
+
+
+@pytest.mark.parametrize("storage", STORAGE_MODES)
+@pytest.mark.parametrize("directed", [True, False])
+@pytest.mark.parametrize("interned", [False, True])
+@pytest.mark.parametrize("method", ["degree", "bfs", "rcm"])
+def test_reorder_nodes(storage, directed, interned, method):
+    edges = grid_edges()
+    graph = LolGraph(directed=directed, storage=storage, interned=interned)
+    graph.convert_from_arrays(*[np.array([edge[i] for edge in edges]) for i in range(3)])
+    reordered = LolGraph(directed=directed, storage=storage, interned=interned)
+    reordered.convert_from_arrays(*[np.array([edge[i] for edge in edges]) for i in range(3)], reorder=method)
+    assert named_reads(reordered) == named_reads(graph)
+    labels = graph.node_labels()
+    assert reordered.node_labels() == [labels[number] for number in reordered.node_permutation.tolist()]
+
+    '''the same order as reordering after the build, and as with list storage'''
+    after = graph.copy()
+    after.reorder_nodes(method)
+    listed = LolGraph(directed=directed, interned=interned)
+    listed.convert(edges, reorder=method)
+    assert after.node_labels() == reordered.node_labels() == listed.node_labels()
+
+    sources, targets, _ = reordered.edge_arrays(numbers=True)
+    if method == "degree":
+        degrees = np.bincount(sources, minlength=60) + np.bincount(targets, minlength=60)
+        assert (np.diff(degrees) <= 0).all()
+    else:
+        '''a breadth first order: every node but the first is a neighbor of a node numbered before it'''
+        first_neighbor = np.full(60, 60)
+        np.minimum.at(first_neighbor, np.r_[sources, targets], np.r_[targets, sources])
+        assert (first_neighbor[1:] < np.arange(1, 60)).all()
+        assert bandwidth(reordered) <= 8 < bandwidth(graph)
+
+
+# rows of sorted neighbors with gaps of 1, 2 and 3 varint bytes, some of the rows empty
+def ragged_rows(rng, rows_amount=300, largest=3000000):
+    lengths = rng.integers(0, 12, rows_amount) * (rng.random(rows_amount) > 0.2)
+    index_list = np.concatenate(([0], np.cumsum(lengths)))
+    neighbors_list = np.concatenate([np.sort(rng.choice(largest, length, replace=False)) for length in lengths])
+    return index_list, neighbors_list
+
+
+@pytest.mark.parametrize("rows_amount", [3, 300])
+def test_varint_round_trip(rows_amount):
+    rng = np.random.default_rng(rows_amount)
+    index_list, neighbors_list = ragged_rows(rng, rows_amount)
+    data, offsets = varint_encode(index_list, neighbors_list)
+    assert len(offsets) == len(index_list) and offsets[-1] == len(data) < 4 * len(neighbors_list) + 1
+    for row in range(rows_amount):
+        deltas = varint_decode(data[offsets[row]: offsets[row + 1]])
+        assert np.cumsum(deltas).tolist() == neighbors_list[index_list[row]: index_list[row + 1]].tolist()
+    assert varint_decode(varint_encode([0, 3], [0, 127, 2 ** 40])[0]).tolist() == [0, 127, 2 ** 40 - 127]
+    with pytest.raises(ValueError):
+        varint_encode([0, 2], [5, 3])
+
+
+def test_compressed_neighbors_indexing():
+    index_list, neighbors_list = ragged_rows(np.random.default_rng(0))
+    compressed = CompressedNeighbors(index_list, neighbors_list)
+    assert len(compressed) == len(neighbors_list) and np.array_equal(np.asarray(compressed), neighbors_list)
+    for start, stop, step in [(0, 5, 1), (17, 400, 1), (3, 3, 1), (10, 2, 1), (5, 300, 7), (None, None, -3),
+                              (-40, -2, 1), (len(neighbors_list) - 1, None, 1)]:
+        assert compressed[start: stop: step].tolist() == neighbors_list[start: stop: step].tolist()
+    for position in (0, 1, 100, -1, len(neighbors_list) - 1):
+        assert compressed[position] == neighbors_list[position]
+    with pytest.raises(IndexError):
+        compressed[len(neighbors_list)]
+
+
+# a random graph with large node names, read and changed the same way with compressed and with list storage
+@pytest.mark.parametrize("directed", [True, False])
+@pytest.mark.parametrize("interned", [False, True])
+def test_compressed_storage_matches_list(directed, interned):
+    rng = np.random.default_rng(2)
+    sources, targets = rng.integers(0, 40000, 3000), rng.integers(0, 40000, 3000)
+    keep = np.unique(sources * 40000 + targets, return_index=True)[1]
+    if not directed:
+        keep = keep[sources[keep] < targets[keep]]
+    sources, targets, weights = sources[keep], targets[keep], rng.random(len(keep)).round(3) + 0.5
+    graphs = {}
+    for storage in ("list", "compressed"):
+        graphs[storage] = LolGraph(directed=directed, storage=storage, interned=interned)
+        graphs[storage].convert_from_arrays(sources, targets, weights)
+    listed, compressed = graphs["list"], graphs["compressed"]
+    assert reads(compressed) == reads(listed)
+    pairs = [(node, neighbor) for node in compressed.nodes()[:200] for neighbor in compressed.nodes()[:40]]
+    assert np.array_equal(compressed.get_edge_data_many(pairs), listed.get_edge_data_many(pairs), equal_nan=True)
+    assert [compressed.is_edge_between_nodes(*pair) for pair in pairs] == \
+           [listed.is_edge_between_nodes(*pair) for pair in pairs]
+    assert [dict(compressed.graph_adjacency()[node]) for node in compressed.nodes()[:100]] == \
+           [dict(listed.graph_adjacency()[node]) for node in listed.nodes()[:100]]
+
+    nodes = listed.nodes()
+    added = [[nodes[i], nodes[-i - 1], float(i)] for i in range(1, 1500, 7)]
+    removed = [edge[:2] for edge in listed.edges()[::5]]
+    for graph in (listed, compressed):
+        graph.add_edges(added)
+        graph.remove_edges(removed)
+        assert graph.pending_changes() > 0
+    assert reads(compressed) == reads(listed)
+    for graph in (listed, compressed):
+        graph.compact()
+        graph.remove_nodes(nodes[::11])
+    assert reads(compressed) == reads(listed)
+    assert isinstance(compressed._neighbors_list, CompressedNeighbors)
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from multipartite_lol_graph import MultipartiteLol
+
+DIRECTIONS = [(0, 1), (1, 0), (1, 2), (2, 1), (0, 2)]
+
+
+# csv files of random weighted edges between the groups of DIRECTIONS, the ids of every group are 0, ..., 19
+@pytest.fixture
+def graph_files(tmp_path):
+    rng = np.random.default_rng(0)
+    files = []
+    for source_group, target_group in DIRECTIONS:
+        edges = pd.DataFrame({"source": rng.integers(0, 20, 60), "target": rng.integers(0, 20, 60),
+                              "weight": rng.integers(1, 10, 60).astype(float)}).drop_duplicates(["source", "target"])
+        files.append(str(tmp_path / f"{source_group}{target_group}.csv"))
+        edges.to_csv(files[-1], index=False)
+    return files
+
+
+def build(files, **kwargs):
+    order_by_group = kwargs.pop("order_by_group", False)
+    graph = MultipartiteLol(**kwargs)
+    graph.convert_with_csv(files, DIRECTIONS, order_by_group=order_by_group)
+    return graph
+
+
+# the edges of the graph by the names of their nodes ("<group>_<id>"), as a set
+def named_edges(graph):
+    labels = graph.node_labels() if graph.is_interned() else None
+    if labels is None:
+        return {(source, target, weight) for source, target, weight in graph.edges()}
+    return {(labels[source], labels[target], weight) for source, target, weight in graph.edges()}
+
+
+def test_copy_is_isolated(graph_files):
+    graph = build(graph_files)
+    graph.set_nodes_type_dict()
+    node = graph.nodes()[0]
+    before, types = named_edges(graph), graph.return_node_type(node)
+    new_graph = graph.copy()
+    new_graph.nodes_type_dict[node]["type"] = [0] * graph.groups_number
+    new_graph.add_edges([[node, "2_99", 1.]])
+    new_graph.remove_nodes([graph.nodes()[1]])
+    assert named_edges(graph) == before and graph.return_node_type(node) == types
+    assert new_graph.return_node_type("2_99") == [0, 0, 1]
+    assert "2_99" not in graph.nodes() and graph.number_of_nodes() == new_graph.number_of_nodes()
+
+
+# the group of a node name "<group>_<id>"
+def group(name):
+    return int(name.split("_")[0])
+
+
+@pytest.mark.parametrize("storage", ["list", "numpy", "compressed"])
+@pytest.mark.parametrize("interned", [False, True])
+def test_order_by_group(graph_files, storage, interned):
+    graph = build(graph_files, storage=storage, interned=interned)
+    ordered = build(graph_files, storage=storage, interned=interned, order_by_group=True)
+    assert named_edges(ordered) == named_edges(graph)
+    assert sorted(ordered.node_labels()) == sorted(graph.node_labels())
+    groups = [group(name) for name in ordered.node_labels()]
+    assert groups == sorted(groups)
+    assert ordered.group_offsets.tolist() == np.searchsorted(groups, range(ordered.groups_number + 1)).tolist()
+    assert [ordered.node_group(node) for node in ordered.nodes()] == groups
+
+
+@pytest.mark.parametrize("storage", ["list", "numpy", "compressed"])
+@pytest.mark.parametrize("interned", [False, True])
+@pytest.mark.parametrize("order_by_group", [False, True])
+def test_subgraph_and_block(graph_files, storage, interned, order_by_group):
+    graph = build(graph_files, storage=storage, interned=interned, order_by_group=order_by_group)
+    edges = named_edges(graph)
+    labels = graph.node_labels()
+    for src_group, dst_group in DIRECTIONS + [(2, 0)]:
+        block = graph.block(src_group, dst_group)
+        assert named_edges(block) == {edge for edge in edges
+                                      if (group(edge[0]), group(edge[1])) == (src_group, dst_group)}
+        assert sorted(block.node_labels()) == sorted(name for name in labels if group(name) in (src_group, dst_group))
+        assert sorted(map(tuple, block.reversed_lol.edges())) == sorted((t, s, w) for s, t, w in block.edges())
+    kept = [name for name in labels if int(name.split("_")[1]) % 3 == 0]
+    subgraph = graph.subgraph([graph.node_from_label(name) for name in kept])
+    assert named_edges(subgraph) == {edge for edge in edges if edge[0] in kept and edge[1] in kept}
+    assert sorted(subgraph.node_labels()) == sorted(kept)
+    assert [group(name) for name in subgraph.node_labels()] == [subgraph.node_group(node) for node in subgraph.nodes()]